@@ -0,0 +1,165 @@
+""" Benchmarks for psm samplers and ParameterMap operations.
+
+Times and memory-profiles ParameterMap lookups, fix_parameters, apply,
+getdivisions/combinations, latin_hypercube and the NumPy designs of
+`psm.sampling` over a range of ensemble sizes, parameter counts and solution
+types, using a cheap synthetic model.
+
+Usage:
+
+    python benchmarks/bench.py -o results.json
+    python benchmarks/bench.py --scales 1000,10000 \\
+        --baseline benchmarks/baseline.json
+
+By default, ensembles of 10^3 to 10^6 runs are measured, which takes about an
+hour, and the largest array-solution cases need more than 6 GB of memory;
+pass smaller `--scales` for a quick check. Results are written as JSON.
+If a baseline file is given, timings are compared against it and the script
+exits with status 1 if any case slowed down by more than `--threshold`.
+
+`baseline.json` holds reference results for the default cases, measured with
+`--repeat 1` (its metadata notes any cases left out). Timings depend on the
+machine, so for a meaningful comparison regenerate it on the machine running
+the benchmarks before making changes.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import psm
+
+def scalar_model(p):
+    return sum(p.values())
+
+def array_model(p):
+    return [sum(p.values())]*16
+
+MODELS = {"scalar": scalar_model, "array": array_model}
+
+def make_parameters(nparams):
+    return [psm.Parameter("p{0}".format(i), (1.0, 10.0)) for i in range(nparams)]
+
+def make_divisions(nruns, nparams):
+    """ Return the number of divisions per parameter giving about *nruns*
+    grid points. """
+    return max(2, int(round(nruns ** (1.0/nparams))))
+
+def make_pmap(parameters, divisions, soln):
+    return psm.fillspace(MODELS[soln], parameters, divisions)
+
+def measure(func, repeat):
+    """ Return the best wall time of *repeat* calls and the peak memory
+    allocated during one call. """
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t0)
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+def cases(parameters, divisions, soln):
+    """ Yield `(name, function)` pairs to benchmark. """
+    pmap = make_pmap(parameters, divisions, soln)
+    keys = list(zip(*pmap.values))
+    fixed = psm.FixedParameter(parameters[0].name, pmap.values[0][0])
+    model = MODELS[soln]
+
+    yield "getitem", lambda: [pmap[key] for key in keys]
+    yield "fix_parameters", lambda: list(pmap.fix_parameters(fixed).solutions)
+    yield "apply", lambda: pmap.apply(len if soln == "array" else abs)
+    yield "combinations", lambda: list(psm.combinations(parameters, divisions))
+    yield "fillspace", lambda: psm.fillspace(model, parameters, divisions)
+    yield "latin_hypercube", lambda: psm.latin_hypercube(model, parameters,
+                                                         len(pmap), seed=0)
+    yield "lhs_design", lambda: psm.sampling.design(parameters, len(pmap),
+                                                    "lhs", seed=0)
+    yield "sobol_design", lambda: psm.sampling.design(parameters, len(pmap),
+                                                      "sobol")
+
+def run(scales, nparams, solns, repeat, log=sys.stderr):
+    results = []
+    for nruns in scales:
+        for n in nparams:
+            parameters = make_parameters(n)
+            divisions = make_divisions(nruns, n)
+            for soln in solns:
+                size = divisions ** n
+                for name, func in cases(parameters, divisions, soln):
+                    seconds, peak = measure(func, repeat)
+                    results.append({"name": name, "runs": size,
+                                    "params": n, "soln": soln,
+                                    "seconds": seconds, "peak_bytes": peak})
+                    log.write("{0:16s} runs={1:<8d} params={2} soln={3:6s} "
+                              "{4:10.4f} s {5:12d} B\n".format(
+                                  name, size, n, soln, seconds, peak))
+    return results
+
+def casekey(result):
+    return (result["name"], result["runs"], result["params"], result["soln"])
+
+def compare(results, baseline, threshold, log=sys.stderr):
+    """ Report cases slower than *threshold* times the baseline and return
+    their number. """
+    reference = {casekey(r): r for r in baseline["results"]}
+    regressions = 0
+    for r in results:
+        ref = reference.get(casekey(r))
+        if ref is None or ref["seconds"] == 0:
+            continue
+        ratio = r["seconds"] / ref["seconds"]
+        if ratio > threshold:
+            regressions += 1
+            log.write("REGRESSION {0} runs={1} params={2} soln={3}: "
+                      "{4:.2f}x baseline\n".format(*(casekey(r) + (ratio,))))
+    return regressions
+
+def intlist(s):
+    return [int(float(v)) for v in s.split(",")]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=intlist,
+                        default=[1000, 10000, 100000, 1000000],
+                        help="comma-separated ensemble sizes")
+    parser.add_argument("--params", type=intlist, default=[2, 4, 8],
+                        help="comma-separated parameter counts")
+    parser.add_argument("--solns", default="scalar,array",
+                        help="comma-separated solution types (scalar, array)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("-o", "--output", help="file to write results to")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.5,
+                        help="slowdown ratio reported as a regression")
+    args = parser.parse_args(argv)
+
+    results = run(args.scales, args.params, args.solns.split(","), args.repeat)
+    output = {"meta": {"python": platform.python_version(),
+                       "platform": platform.platform(),
+                       "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+              "results": results}
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=1)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold) != 0:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,15 @@
 
 from .core import *
-from .parametermap import ParameterMap
+from .parametermap import (ParameterMap, ColumnarParameterMap,
+                           SQLiteParameterMap, MemmapParameterMap, concat)
+from .aio import afillspace, alatin_hypercube
+from . import distributed, sampling
+from .cache import ModelCache, canonical_hash
+from .io import from_arrow, read_hdf5, read_parquet
+from .monitor import RunMonitor
 from .parameters import Parameter, DiscreteValueParameter, FixedParameter
+from .reduction import StreamingReducer
+from .surrogate import Surrogate
 
 __all__ = ["parameterspace", "parametermap", "core"]
 
@@ -0,0 +1,80 @@
+""" asyncio counterparts of the ensemble runners in `core`, for model calls
+that spend most of their time waiting on subprocesses or servers. """
+
+import asyncio
+import collections
+import inspect
+
+from .core import combinations, hypercube, _missing
+from .parametermap import ParameterMap
+
+async def afillspace(model_call, parameters, divisions, concurrency=16,
+                     pmap=None, **kw):
+    """ Coroutine version of `fillspace`.
+
+    *model_call* may be a coroutine function, or a regular function, which is
+    run in a thread. At most `concurrency::int` runs are awaited at once.
+    *pmap* and *kw* are as for `fillspace`.
+    """
+    if pmap is None:
+        pmap = ParameterMap(parameters, **kw)
+    combos = _missing(pmap, combinations(parameters, divisions))
+    async for combo, res in _arunall(model_call, parameters, combos,
+                                     concurrency):
+        pmap.set(combo, res)
+    return pmap
+
+async def alatin_hypercube(model_call, parameters, divisions, concurrency=16,
+                           pmap=None, seed=None, **kw):
+    """ Coroutine version of `latin_hypercube`. See `afillspace`. """
+    if pmap is None:
+        pmap = ParameterMap(parameters, **kw)
+    combos = _missing(pmap, hypercube(parameters, divisions, seed=seed))
+    async for combo, res in _arunall(model_call, parameters, combos,
+                                     concurrency):
+        pmap.set(combo, res)
+    return pmap
+
+async def _arunall(model_call, parameters, combos, concurrency):
+    """ Asynchronous generator yielding `(combo, result)` in the order of
+    *combos*.
+
+    A semaphore limits the number of concurrent runs to *concurrency*, and no
+    more than four times that many tasks are created ahead of the oldest
+    unfinished run, so buffered results stay bounded.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    names = [p.name for p in parameters]
+    semaphore = asyncio.Semaphore(concurrency)
+    window = 4*concurrency
+
+    async def run(combo):
+        parameter_dict = dict(zip(names, combo))
+        async with semaphore:
+            if inspect.iscoroutinefunction(model_call):
+                return await model_call(parameter_dict)
+            res = await asyncio.to_thread(model_call, parameter_dict)
+            if inspect.isawaitable(res):
+                res = await res
+            return res
+
+    pending = collections.deque()
+    combos = iter(combos)
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < window:
+                try:
+                    combo = next(combos)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.append((combo, asyncio.ensure_future(run(combo))))
+            if len(pending) == 0:
+                break
+            combo, task = pending.popleft()
+            yield combo, await task
+    finally:
+        for _, task in pending:
+            task.cancel()
@@ -0,0 +1,172 @@
+""" Memoization of model calls across ensembles. """
+
+import collections
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+
+from .parametermap import _keyvalue, _pyvalue
+
+def canonical_hash(parameter_dict, version=None):
+    """ Return a hex digest identifying *parameter_dict* and model *version*.
+
+    Parameter order does not matter, NumPy scalars hash like the equivalent
+    Python scalars, and floats are rounded as for ParameterMap keys.
+    """
+    items = []
+    for name in sorted(parameter_dict):
+        value = _keyvalue(_pyvalue(parameter_dict[name]))
+        items.append([str(name), type(value).__name__, repr(value)])
+    payload = json.dumps([repr(version), items])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ModelCache(object):
+    """ Wraps *model_call*, memoizing its results by parameter values and a
+    user-supplied model *version*.
+
+    Results are kept in an in-memory LRU of *maxsize* entries. If *directory*
+    is given, they are also pickled there, and the least recently used files
+    are evicted to keep the directory under *maxbytes*. Counters `hits`,
+    `disk_hits` and `misses` record how many runs were avoided.
+
+    The memory tier and counters are per-process, so with a process pool only
+    the disk tier is shared between workers.
+    """
+
+    def __init__(self, model_call, version=None, maxsize=128, directory=None,
+                 maxbytes=None):
+        self.model_call = model_call
+        self.version = version
+        self.maxsize = maxsize
+        self.directory = directory
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = collections.OrderedDict()
+        self._lock = threading.Lock()
+        if directory is not None and not os.path.isdir(directory):
+            os.makedirs(directory)
+        return
+
+    def __repr__(self):
+        return "<ModelCache[{0}]({1} hits, {2} misses)>".format(
+                    self.version, self.hits, self.misses)
+
+    def __getstate__(self):
+        # workers start with an empty memory tier and their own counters
+        state = self.__dict__.copy()
+        for name in ("_lock", "_memory", "hits", "disk_hits", "misses"):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = collections.OrderedDict()
+        self._lock = threading.Lock()
+        return
+
+    def __call__(self, parameter_dict):
+        key = canonical_hash(parameter_dict, self.version)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+        if self.directory is not None:
+            found, res = self._load(key)
+            if found:
+                with self._lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+                    self._remember(key, res)
+                return res
+
+        res = self.model_call(parameter_dict)
+        with self._lock:
+            self.misses += 1
+            self._remember(key, res)
+        if self.directory is not None:
+            self._dump(key, res)
+        return res
+
+    def stats(self):
+        """ Return a dictionary of cache counters. """
+        calls = self.hits + self.misses
+        return {"hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits/calls if calls != 0 else 0.0,
+                "size": len(self._memory)}
+
+    def clear(self):
+        """ Empty both cache tiers. """
+        with self._lock:
+            self._memory.clear()
+        if self.directory is not None:
+            for entry in self._entries():
+                os.remove(entry.path)
+        return
+
+    def _remember(self, key, res):
+        self._memory[key] = res
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+        return
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".pkl")
+
+    def _entries(self):
+        return [e for e in os.scandir(self.directory) if e.name.endswith(".pkl")]
+
+    def _load(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                res = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return False, None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return True, res
+
+    def _dump(self, key, res):
+        fd, tmppath = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(res, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmppath, self._path(key))
+        if self.maxbytes is not None:
+            self._evict()
+        return
+
+    def _evict(self):
+        """ Remove least recently used files until the disk tier fits within
+        `maxbytes`. """
+        entries = []
+        for e in self._entries():
+            try:
+                st = e.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, e.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.maxbytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+        return
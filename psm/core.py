@@ -1,6 +1,16 @@
-from random import shuffle
+import concurrent.futures
+from functools import reduce
+import heapq
 import itertools
-from .parametermap import ParameterMap
+import math
+from math import exp, log
+import operator
+import random
+import threading
+import time
+import traceback
+from .parametermap import ParameterMap, _indexkey, _keyvalue
+from .parallel import get_executor, imap
 
 def combinations(parameters, N):
     """ Returns all combinations of parameters with *N* subdivisions. *N* may
@@ -8,42 +18,663 @@ def combinations(parameters, N):
     values = getdivisions(parameters, N)
     return itertools.product(*values)
 
-def fillspace(model_call, parameters, divisions, **kw):
-    """ `divisions::list,dict,int` specifies the number of realizations to add """
-    pmap = ParameterMap(parameters, **kw)
-    for combo in combinations(parameters, divisions):
-        parameter_dict = {}
-        for p, val in zip(parameters, combo):
-            parameter_dict[p.name] = val
-        res = model_call(parameter_dict)
-        pmap.set(combo, res)
-    return pmap
+class CombinationSpace(object):
+    """ Immutable, random-access sequence of the combinations of *parameters*
+    with *N* subdivisions (in any form accepted by `getdivisions`).
+
+    Item *k* is the *k*th combination produced by `combinations`, and is
+    computed in O(d) time for d parameters. Slicing and `shard` return
+    subspaces sharing the same values, so independent processes can each
+    evaluate part of a sweep without coordinating.
+    """
+
+    __slots__ = ("names", "values", "_sizes", "_lookup", "_range")
+
+    def __init__(self, parameters, N):
+        self.names = tuple(p.name for p in parameters)
+        self.values = tuple(getdivisions(parameters, N))
+        self._sizes = tuple(len(v) for v in self.values)
+        self._lookup = tuple({_keyvalue(x): i for i, x in enumerate(v)}
+                             for v in self.values)
+        self._range = range(reduce(operator.mul, self._sizes, 1))
+        return
+
+    def __repr__(self):
+        return "<CombinationSpace({0}: {1} of {2})>".format(
+                    ",".join(self.names), len(self), self.size)
+
+    def __len__(self):
+        return len(self._range)
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return self._subspace(self._range[k])
+        return self._decode(self._range[k])
+
+    def __iter__(self):
+        if self._range == range(self.size):
+            return itertools.product(*self.values)
+        return (self._decode(k) for k in self._range)
+
+    def __contains__(self, combo):
+        try:
+            self.index(combo)
+        except ValueError:
+            return False
+        return True
 
-def latin_hypercube(model_call, parameters, divisions, **kw):
+    @property
+    def size(self):
+        """ Number of combinations in the full space. """
+        return reduce(operator.mul, self._sizes, 1)
+
+    def _decode(self, k):
+        combo = [None]*len(self._sizes)
+        for j in range(len(self._sizes)-1, -1, -1):
+            k, i = divmod(k, self._sizes[j])
+            combo[j] = self.values[j][i]
+        return tuple(combo)
+
+    def _subspace(self, krange):
+        space = object.__new__(CombinationSpace)
+        for attr in ("names", "values", "_sizes", "_lookup"):
+            setattr(space, attr, getattr(self, attr))
+        space._range = krange
+        return space
+
+    def index(self, combo):
+        """ Return the position of *combo* in this space. """
+        if len(combo) != len(self._sizes):
+            raise ValueError("Expected {0} parameter values".format(
+                             len(self._sizes)))
+        k = 0
+        for j, x in enumerate(combo):
+            try:
+                i = self._lookup[j][_keyvalue(x)]
+            except (KeyError, TypeError):
+                raise ValueError("{0} is not a value of '{1}'".format(
+                                 x, self.names[j]))
+            k = k*self._sizes[j] + i
+        return self._range.index(k)
+
+    def shard(self, i, n, contiguous=False):
+        """ Return shard *i* of *n* disjoint shards covering this space. By
+        default, shards take every *n*th combination; if *contiguous*, each is
+        a block of consecutive combinations. """
+        if not 0 <= i < n:
+            raise ValueError("Shard {0} does not exist out of {1}".format(i, n))
+        if not contiguous:
+            return self[i::n]
+        size, extra = divmod(len(self), n)
+        start = i*size + min(i, extra)
+        stop = start + size + (1 if i < extra else 0)
+        return self[start:stop]
+
+def fillspace(model_call, parameters, divisions, executor=None, workers=None,
+              pmap=None, sink=None, batchsize=None, monitor=None, shard=None,
+              timeout=None, retries=0, on_error="raise", **kw):
+    """ `divisions::list,dict,int` specifies the number of realizations to add
+
+    Keyword arguments:
+    `executor::string,Executor` is "thread", "process", or a
+    `concurrent.futures.Executor` used to run combinations concurrently
+    `workers::int` is the number of workers to start if no Executor is given
+    `pmap::ParameterMap` is a map to add the runs to (e.g. a
+    `ColumnarParameterMap`). Combinations already in *pmap* are not run
+    again, so a `SQLiteParameterMap` from an interrupted ensemble can be
+    passed to resume it. By default, a new ParameterMap is constructed from
+    *kw*.
+    `sink::callable` is called as `sink(parameter_dict, result)` for each
+    run instead of storing results in a ParameterMap, and is returned
+    `batchsize::int` switches to batch mode, where *model_call* is passed a
+    dictionary of NumPy arrays holding up to *batchsize* values of each
+    parameter, and returns a sequence of as many results
+    `monitor::RunMonitor` reports progress, calls run hooks, and records run
+    times in the ParameterMap
+    `shard::tuple` is a pair `(i, n)` restricting the runs to shard *i* of
+    *n* (see `CombinationSpace.shard`)
+    `timeout::float` is the time in seconds after which a run is abandoned
+    and counts as failed. The abandoned call is left running in a daemon
+    thread, so *model_call* should not hold resources other runs need
+    `retries::int` is the number of times a failed run is repeated
+    `on_error::string` is "raise" to stop the ensemble when a run fails, or
+    "capture" to record the failure as a `RunFailure` in `pmap.failures`
+    and carry on. Captured failures can be retried with `rerun_failures`.
+    With a *sink*, the RunFailure is passed in place of the result
+    """
+    policy = _policy(timeout, retries, on_error)
+    if sink is not None:
+        return _tosink(iter_fillspace(model_call, parameters, divisions,
+                                      executor=executor, workers=workers,
+                                      ordered=False, batchsize=batchsize,
+                                      monitor=monitor, shard=shard,
+                                      timeout=timeout, retries=retries,
+                                      on_error=on_error), sink)
+    if pmap is None:
+        pmap = ParameterMap(parameters, **kw)
+    space = _space(parameters, divisions, shard)
+    if monitor is not None:
+        monitor.start(len(space))
+    combos = _missing(pmap, space, monitor)
+    return _fill(pmap, model_call, parameters, combos, executor, workers,
+                 batchsize, monitor, policy)
+
+def latin_hypercube(model_call, parameters, divisions, executor=None,
+                    workers=None, pmap=None, seed=None, sink=None,
+                    batchsize=None, monitor=None, timeout=None, retries=0,
+                    on_error="raise", **kw):
     """ Sample a latin hypercube with `divisions::int` divisions along each
-    parameter """
-    pmap = ParameterMap(parameters, **kw)
+    parameter. *executor*, *workers*, *pmap*, *sink*, *batchsize*, *monitor*,
+    *timeout*, *retries*, and *on_error* are as for `fillspace`. Resuming an
+    interrupted hypercube requires the same `seed::int`. """
+    policy = _policy(timeout, retries, on_error)
+    if sink is not None:
+        return _tosink(iter_latin_hypercube(model_call, parameters, divisions,
+                                            executor=executor, workers=workers,
+                                            seed=seed, ordered=False,
+                                            batchsize=batchsize,
+                                            monitor=monitor, timeout=timeout,
+                                            retries=retries,
+                                            on_error=on_error), sink)
+    if pmap is None:
+        pmap = ParameterMap(parameters, **kw)
 
-    values = [p.partition(divisions) for p in parameters]
-    for v in values:
-        shuffle(v)
+    if monitor is not None:
+        monitor.start(divisions)
+    combos = _missing(pmap, hypercube(parameters, divisions, seed=seed),
+                      monitor)
+    return _fill(pmap, model_call, parameters, combos, executor, workers,
+                 batchsize, monitor, policy)
+
+def rerun_failures(model_call, parameters, pmap, executor=None, workers=None,
+                   batchsize=None, monitor=None, timeout=None, retries=0,
+                   on_error="capture"):
+    """ Run again the combinations recorded in `pmap.failures`, storing the
+    solutions of those that now succeed and removing them from the failures.
+    Other arguments are as for `fillspace`. """
+    policy = _policy(timeout, retries, on_error)
+    # index keys are rounded, so rerun the combinations as originally given
+    combos = [getattr(failure, "combo", None) or key
+              for key, failure in pmap.failures.items()]
+    if monitor is not None:
+        monitor.start(len(combos))
+    return _fill(pmap, model_call, parameters, combos, executor, workers,
+                 batchsize, monitor, policy)
+
+def _fill(pmap, model_call, parameters, combos, executor, workers, batchsize,
+          monitor, policy=None):
+    """ Run *combos* and store the results in *pmap*, annotated with run
+    statistics if a *monitor* is given. Failures captured by *policy* are
+    recorded with `pmap.fail`. """
+    if batchsize is None:
+        for combo, res, stats in _iterresults(model_call, parameters, combos,
+                                              executor=executor,
+                                              workers=workers,
+                                              monitor=monitor, policy=policy):
+            if isinstance(res, RunFailure):
+                pmap.fail(combo, res)
+                continue
+            pmap.set(combo, res)
+            if len(pmap.failures) != 0:
+                pmap.failures.pop(_indexkey(combo), None)
+            if stats is not None:
+                pmap.annotate(combo, **stats)
+    else:
+        for chunk, results, stats in _iterbatches(model_call, parameters,
+                                                  combos, batchsize,
+                                                  executor=executor,
+                                                  workers=workers,
+                                                  monitor=monitor,
+                                                  policy=policy):
+            if isinstance(results, RunFailure):
+                for combo in chunk:
+                    pmap.fail(combo, results)
+                continue
+            pmap.extend(chunk, results)
+            if len(pmap.failures) != 0:
+                for combo in chunk:
+                    pmap.failures.pop(_indexkey(combo), None)
+            if stats is not None:
+                for combo in chunk:
+                    pmap.annotate(combo, **stats)
+    return pmap
+
+def adaptive(model_call, parameters, divisions, metric, budget, tol=0.0,
+             executor=None, workers=None, pmap=None, **kw):
+    """ Sample parameter space adaptively, concentrating runs where the model
+    output changes most.
+
+    Starts from the `fillspace` grid with *divisions*, then repeatedly
+    bisects the grid cell whose corner solutions differ most according to
+    `metric::function`, which maps a solution to a scalar. Stops before
+    exceeding `budget::int` model runs (including the initial grid, which
+    must fit within it), or when no cell's corners differ by more than
+    `tol::float`. Cells are bisected in log space along
+    parameters with `scale="log"`. DiscreteValueParameters are not refined.
+    *executor*, *workers*, *pmap* and *kw* are as for `fillspace`.
+    """
+    if pmap is None:
+        pmap = ParameterMap(parameters, **kw)
+    grid = getdivisions(parameters, divisions)
+    ngrid = reduce(operator.mul, [len(v) for v in grid], 1)
+    if ngrid > budget:
+        raise ValueError("The initial grid of {0} runs exceeds the budget of "
+                         "{1}".format(ngrid, budget))
+    cont = [j for j, p in enumerate(parameters) if p.distribution != "discrete"]
+    disc = [j for j in range(len(parameters)) if j not in cont]
+
+    logscale = [getattr(parameters[j], "scale", "linear") == "log" for j in cont]
+    midpoints = [{} for _ in cont]
+
+    def midpoint(k, a, b):
+        # computed once per edge, so that cells sharing an edge share its
+        # midpoint exactly, and grid values are never recomputed
+        m = midpoints[k].get((a, b))
+        if m is None:
+            m = exp(0.5*(log(a)+log(b))) if logscale[k] else 0.5*(a+b)
+            midpoints[k][(a, b)] = m
+        return m
+
+    def combo_at(point, dvals):
+        combo = [None]*len(parameters)
+        for j, x in zip(cont, point):
+            combo[j] = x
+        for j, v in zip(disc, dvals):
+            combo[j] = v
+        return tuple(combo)
+
+    scores = {}
+    nruns = [0]
+
+    def evaluate(combos):
+        combos = [c for c in combos if c not in pmap]
+        for combo, res in _iterruns(model_call, parameters, combos,
+                                    executor=executor, workers=workers):
+            pmap.set(combo, res)
+            nruns[0] += 1
+        return
+
+    def spread(lo, hi, dvals):
+        ms = []
+        for corner in itertools.product(*zip(lo, hi)):
+            key = _indexkey(combo_at(corner, dvals))
+            if key not in scores:
+                scores[key] = metric(pmap[combo_at(corner, dvals)])
+            ms.append(scores[key])
+        return max(ms) - min(ms)
+
+    evaluate(itertools.product(*grid))
+    if len(cont) == 0:
+        return pmap
+
+    heap = []
+    counter = itertools.count()
+    axes = [grid[j] for j in cont]
+    for dvals in itertools.product(*[grid[j] for j in disc]):
+        for cell in itertools.product(*[range(len(a)-1) for a in axes]):
+            lo = tuple(a[i] for a, i in zip(axes, cell))
+            hi = tuple(a[i+1] for a, i in zip(axes, cell))
+            heapq.heappush(heap, (-spread(lo, hi, dvals), next(counter),
+                                  lo, hi, dvals))
+
+    while len(heap) != 0:
+        score, _, lo, hi, dvals = heapq.heappop(heap)
+        if -score <= tol:
+            break
+        mid = tuple(midpoint(k, a, b) for k, (a, b) in enumerate(zip(lo, hi)))
+        points = [combo_at(point, dvals)
+                  for point in itertools.product(*zip(lo, mid, hi))]
+        missing = [c for c in points if c not in pmap]
+        if nruns[0] + len(missing) > budget:
+            break
+        evaluate(missing)
+        for halves in itertools.product(*[((a, m), (m, b))
+                                          for a, m, b in zip(lo, mid, hi)]):
+            sublo = tuple(h[0] for h in halves)
+            subhi = tuple(h[1] for h in halves)
+            heapq.heappush(heap, (-spread(sublo, subhi, dvals), next(counter),
+                                  sublo, subhi, dvals))
+    return pmap
+
+def successive_halving(model_call, parameters, divisions, metric, keep=0.5,
+                       maximize=False, stages=None, executor=None,
+                       workers=None, pmap=None, **kw):
+    """ Run iterative models in stages, continuing only the most promising
+    combinations.
+
+    `model_call::function` returns an iterator, such as a generator, that
+    yields intermediate results of a run, e.g. at intervals of simulated
+    time. Every combination of the `fillspace` grid with *divisions* is
+    advanced by one result per stage. After each stage, the runs still in
+    progress are ranked by `metric::function` of their latest result, and
+    the best fraction `keep::float` (at least one run) continues. Lower
+    metrics are better unless `maximize::bool`. Runs stop when they are
+    exhausted, are not kept, or after `stages::int` stages.
+
+    Each combination's latest result is stored in the ParameterMap, annotated
+    with the `stage` it reached and whether its iterator `finished`. Runs
+    are advanced concurrently by a thread pool if *executor* or *workers* is
+    given; iterators cannot be sent to a process pool. *pmap* and *kw* are as
+    for `fillspace`.
+    """
+    if not 0 < keep <= 1:
+        raise ValueError("keep must be in (0, 1]")
+    if pmap is None:
+        pmap = ParameterMap(parameters, **kw)
+    pool, owned = get_executor(executor, workers)
+    if isinstance(pool, concurrent.futures.ProcessPoolExecutor):
+        if owned:
+            pool.shutdown()
+        raise TypeError("successive_halving cannot advance runs in a process "
+                        "pool. Use a thread pool")
 
-    for i in range(divisions):
-        combo = tuple([v[i] for v in values])
-        parameter_dict = {}
-        for p, val in zip(parameters, combo):
-            parameter_dict[p.name] = val
-        res = model_call(parameter_dict)
-        pmap.set(combo, res)
+    names = [p.name for p in parameters]
+    runs = [(combo, iter(model_call(dict(zip(names, combo)))))
+            for combo in combinations(parameters, divisions)]
+    stage = 0
+    try:
+        while len(runs) != 0 and (stages is None or stage < stages):
+            stage += 1
+            advanced = []
+            for (combo, run), res in imap(_advance, runs, executor=pool):
+                if res is _EXHAUSTED:
+                    if combo in pmap:
+                        pmap.annotate(combo, finished=True)
+                    continue
+                pmap.set(combo, res)
+                pmap.annotate(combo, stage=stage, finished=False)
+                advanced.append((metric(res), combo, run))
 
+            advanced.sort(key=operator.itemgetter(0), reverse=maximize)
+            nkeep = max(1, int(math.ceil(keep*len(advanced))))
+            for _, _, run in advanced[nkeep:]:
+                _close(run)
+            runs = [(combo, run) for _, combo, run in advanced[:nkeep]]
+    finally:
+        for _, run in runs:
+            _close(run)
+        if owned:
+            pool.shutdown(wait=True)
     return pmap
 
+_EXHAUSTED = object()
+
+def _advance(item):
+    """ Return the next result of the run in *item*, or `_EXHAUSTED`. """
+    return next(item[1], _EXHAUSTED)
+
+def _close(run):
+    if hasattr(run, "close"):
+        run.close()
+    return
+
+def iter_fillspace(model_call, parameters, divisions, executor=None,
+                   workers=None, ordered=True, batchsize=None, monitor=None,
+                   shard=None, timeout=None, retries=0, on_error="raise"):
+    """ Generator yielding `(parameter_dict, result)` for each combination of
+    `fillspace` as it completes, without retaining results.
+
+    If `ordered::bool` is False, concurrent runs are yielded in the order
+    they finish rather than the order of `combinations`. Other arguments are
+    as for `fillspace`; captured failures are yielded as `RunFailure`
+    results.
+    """
+    policy = _policy(timeout, retries, on_error)
+    space = _space(parameters, divisions, shard)
+    if monitor is not None:
+        monitor.start(len(space))
+    return _iterdicts(parameters,
+                      _iterruns(model_call, parameters, space,
+                                executor=executor, workers=workers,
+                                ordered=ordered, batchsize=batchsize,
+                                monitor=monitor, policy=policy))
+
+def iter_latin_hypercube(model_call, parameters, divisions, executor=None,
+                         workers=None, seed=None, ordered=True,
+                         batchsize=None, monitor=None, timeout=None,
+                         retries=0, on_error="raise"):
+    """ Generator yielding `(parameter_dict, result)` for each run of
+    `latin_hypercube` as it completes. See `iter_fillspace`. """
+    policy = _policy(timeout, retries, on_error)
+    if monitor is not None:
+        monitor.start(divisions)
+    return _iterdicts(parameters,
+                      _iterruns(model_call, parameters,
+                                hypercube(parameters, divisions, seed=seed),
+                                executor=executor, workers=workers,
+                                ordered=ordered, batchsize=batchsize,
+                                monitor=monitor, policy=policy))
+
+def _space(parameters, divisions, shard):
+    space = CombinationSpace(parameters, divisions)
+    if shard is not None:
+        space = space.shard(*shard)
+    return space
+
+def _iterdicts(parameters, runs):
+    names = [p.name for p in parameters]
+    for combo, res in runs:
+        yield dict(zip(names, combo)), res
+
+def _tosink(runs, sink):
+    for parameter_dict, res in runs:
+        sink(parameter_dict, res)
+    return sink
+
+def hypercube(parameters, divisions, seed=None):
+    """ Return a list of `divisions::int` combinations forming a latin
+    hypercube. `seed::int` makes the sample reproducible. """
+    rng = random.Random(seed)
+    values = [list(p.divisions(divisions)) for p in parameters]
+    for v in values:
+        rng.shuffle(v)
+    return [tuple([v[i] for v in values]) for i in range(divisions)]
+
+def _missing(pmap, combos, monitor=None):
+    """ Filter out combinations that already have a solution in *pmap*. """
+    for combo in combos:
+        if combo not in pmap:
+            yield combo
+        elif monitor is not None:
+            monitor.skip()
+
+class RunFailure(object):
+    """ Record of a run that raised an exception or timed out, stored in
+    `ParameterMap.failures` in place of a solution.
+
+    `error::string` is the exception message, `traceback::string` the
+    formatted traceback, `attempts::int` the number of times the run was
+    tried, and `wall::float` the seconds spent on all attempts. `combo::tuple`
+    holds the parameter values of the run once it is recorded with
+    `ParameterMap.fail`.
+    """
+
+    def __init__(self, error, traceback, attempts, wall, combo=None):
+        self.error = error
+        self.traceback = traceback
+        self.attempts = attempts
+        self.wall = wall
+        self.combo = combo
+        return
+
+    def __repr__(self):
+        return "<RunFailure({0}, attempts={1})>".format(self.error,
+                                                        self.attempts)
+
+def _policy(timeout, retries, on_error):
+    """ Return the _RunPolicy for the given options, or None if runs need no
+    supervision. """
+    if on_error not in ("raise", "capture"):
+        raise ValueError("on_error must be 'raise' or 'capture' "
+                         "(got {0})".format(on_error))
+    if retries < 0:
+        raise ValueError("retries must be non-negative")
+    if timeout is None and retries == 0 and on_error == "raise":
+        return None
+    return _RunPolicy(timeout, retries, on_error == "capture")
+
+class _RunPolicy(object):
+    """ Picklable callable that applies a timeout and retries to a run, and
+    returns a RunFailure in place of raising if *capture* is True. """
+
+    def __init__(self, timeout=None, retries=0, capture=False):
+        self.timeout = timeout
+        self.retries = retries
+        self.capture = capture
+
+    def __call__(self, func, *args):
+        t0 = time.perf_counter()
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                return self._call(func, *args)
+            except Exception as e:
+                if attempts <= self.retries:
+                    continue
+                if not self.capture:
+                    raise
+                error = "".join(traceback.format_exception_only(type(e), e))
+                return RunFailure(error.strip(), traceback.format_exc(),
+                                  attempts, time.perf_counter() - t0)
+
+    def _call(self, func, *args):
+        if self.timeout is None:
+            return func(*args)
+        outcome = []
+
+        def target():
+            try:
+                outcome.append((True, func(*args)))
+            except BaseException as e:
+                outcome.append((False, e))
+
+        thread = threading.Thread(target=target)
+        thread.daemon = True
+        thread.start()
+        thread.join(self.timeout)
+        if thread.is_alive():
+            raise TimeoutError("Run did not finish within {0} "
+                               "s".format(self.timeout))
+        ok, value = outcome[0]
+        if not ok:
+            raise value
+        return value
+
+class _ModelTask(object):
+    """ Picklable callable that evaluates *model_call* for one combination.
+    If a *timer* is given, returns `(result, stats)`. If a *policy* is given,
+    runs are supervised by it and may return a RunFailure. """
+
+    def __init__(self, model_call, names, timer=None, policy=None):
+        self.model_call = model_call
+        self.names = names
+        self.timer = timer
+        self.policy = policy
+
+    def __call__(self, combo):
+        parameter_dict = dict(zip(self.names, combo))
+        if self.policy is None:
+            return self._evaluate(parameter_dict)
+        return self.policy(self._evaluate, parameter_dict)
+
+    def _evaluate(self, parameter_dict):
+        if self.timer is None:
+            return self.model_call(parameter_dict)
+        return self.timer(self.model_call, parameter_dict)
+
+class _BatchTask(_ModelTask):
+    """ Picklable callable that evaluates a vectorized *model_call* for a
+    chunk of combinations. """
+
+    def __call__(self, combos):
+        import numpy as np
+        columns = {name: np.asarray([c[j] for c in combos])
+                   for j, name in enumerate(self.names)}
+        if self.policy is None:
+            return self._evaluate(columns, len(combos))
+        return self.policy(self._evaluate, columns, len(combos))
+
+    def _evaluate(self, columns, n):
+        if self.timer is None:
+            results = self.model_call(columns)
+        else:
+            results, stats = self.timer(self.model_call, columns)
+            stats["batchsize"] = n
+        if len(results) != n:
+            raise ValueError("model_call returned {0} results for a batch of "
+                             "{1}".format(len(results), n))
+        return results if self.timer is None else (results, stats)
+
+def _chunked(iterable, n):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, n))
+        if len(chunk) == 0:
+            return
+        yield chunk
+
+def _iterbatches(model_call, parameters, combos, batchsize, executor=None,
+                 workers=None, ordered=True, monitor=None, policy=None):
+    """ Yield `(chunk, results, stats)` for chunks of *batchsize*
+    combinations. *stats* is None unless a *monitor* is given. If the chunk
+    failed, *results* is a single RunFailure. """
+    if batchsize < 1:
+        raise ValueError("batchsize must be at least 1")
+    timer = None if monitor is None else monitor.timer()
+    task = _BatchTask(model_call, [p.name for p in parameters], timer, policy)
+    for chunk, out in imap(task, _chunked(combos, batchsize),
+                           executor=executor, workers=workers,
+                           ordered=ordered):
+        if monitor is not None:
+            monitor.update(len(chunk))
+        if monitor is None or isinstance(out, RunFailure):
+            yield chunk, out, None
+        else:
+            yield (chunk,) + tuple(out)
+
+def _iterresults(model_call, parameters, combos, executor=None, workers=None,
+                 ordered=True, batchsize=None, monitor=None, policy=None):
+    """ Yield `(combo, result, stats)`, in the order of *combos* if
+    *ordered*, dispatching runs to *executor* if one is requested. *stats* is
+    None unless a *monitor* is given. """
+    if batchsize is not None:
+        for chunk, results, stats in _iterbatches(model_call, parameters,
+                                                  combos, batchsize,
+                                                  executor=executor,
+                                                  workers=workers,
+                                                  ordered=ordered,
+                                                  monitor=monitor,
+                                                  policy=policy):
+            if isinstance(results, RunFailure):
+                results = [results]*len(chunk)
+            for combo, res in zip(chunk, results):
+                yield combo, res, stats
+        return
+
+    timer = None if monitor is None else monitor.timer()
+    task = _ModelTask(model_call, [p.name for p in parameters], timer, policy)
+    for combo, out in imap(task, combos, executor=executor, workers=workers,
+                           ordered=ordered):
+        if monitor is not None:
+            monitor.update()
+        if monitor is None or isinstance(out, RunFailure):
+            yield combo, out, None
+        else:
+            yield (combo,) + tuple(out)
+
+def _iterruns(model_call, parameters, combos, **kw):
+    """ Yield `(combo, result)` pairs. Takes the same arguments as
+    `_iterresults`. """
+    return ((combo, res) for combo, res, _ in
+            _iterresults(model_call, parameters, combos, **kw))
+
 def getdivisions(parameters, N):
     """ Given a set of parameters and an integer/list/dictionary N, return a
     pair of lists containing parameter names and parameter values.
     """
     if isinstance(N, int):
-        values = [p.partition(N) for p in parameters]
+        values = [p.divisions(N) for p in parameters]
 
     elif hasattr(N, "keys"):
         names = [p.name for p in parameters]
@@ -52,7 +683,7 @@ def getdivisions(parameters, N):
             found = False
             for p in parameters:
                 if p.name == name:
-                    values.append(p.partition(N[name]))
+                    values.append(p.divisions(N[name]))
                     found = True
                     break
             if found is False:
@@ -62,6 +693,6 @@ def getdivisions(parameters, N):
         if len(N) != len(parameters):
             raise Exception("Have {0} parameters but recieved {1} "
                             "values".format(len(parameters), len(N)))
-        values = [p.partition(N[i]) for i,p in enumerate(parameters)]
+        values = [p.divisions(N[i]) for i,p in enumerate(parameters)]
 
     return values
@@ -0,0 +1,426 @@
+""" Spreading an ensemble across hosts with a coordinator and workers.
+
+The coordinator (`serve`) publishes combinations to a work queue and merges
+results into a ParameterMap. Workers (`work`) lease tasks from the queue, run
+the model, and return results. Leases not renewed within the lease time are
+returned to the queue, so tasks held by lost workers are reassigned.
+
+Two queues are provided, neither needing outside services:
+`DirectoryQueue` uses a directory on a shared filesystem, and `SocketQueue`
+uses a TCP socket served by the coordinator.
+"""
+
+import os
+import pickle
+import socket
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+from .core import _missing
+from .parametermap import ParameterMap
+
+# Seconds the coordinator waits for a connected client to send its request
+REQUEST_TIMEOUT = 10.0
+
+class QueueClosed(Exception):
+    """ Raised to workers once the coordinator has finished. """
+    pass
+
+def serve(parameters, combos, queue, pmap=None, lease=600.0, poll=0.5,
+          window=1000, **kw):
+    """ Coordinate a distributed ensemble, returning a ParameterMap.
+
+    `combos::iterable` are the combinations to run, e.g. from `combinations`
+    or `hypercube`. Combinations already in *pmap* are skipped.
+    `queue` is a `DirectoryQueue` or `SocketQueue`.
+    `lease::float` is the time in seconds after which a task whose lease has
+    not been renewed is given to another worker.
+    `window::int` is the largest number of tasks published at once.
+
+    Results are added to *pmap* in the order of *combos*. If a run raises an
+    exception on a worker, a RuntimeError is raised.
+    """
+    if pmap is None:
+        pmap = ParameterMap(parameters, **kw)
+    names = [p.name for p in parameters]
+    combos = iter(_missing(pmap, combos))
+
+    queue.open()
+    published = {}      # task number -> combo, for unfinished tasks
+    finished = {}       # task number -> result, awaiting earlier tasks
+    nextk = 0           # next task number to publish
+    nextset = 0         # next task number to add to pmap
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(published) + len(finished) < window:
+                try:
+                    combo = next(combos)
+                except StopIteration:
+                    exhausted = True
+                    break
+                queue.put(nextk, names, combo)
+                published[nextk] = combo
+                nextk += 1
+
+            if exhausted and len(published) == 0 and len(finished) == 0:
+                break
+
+            collected = queue.collect()
+            for k, res, error in collected:
+                if k not in published:
+                    continue
+                if error is not None:
+                    raise RuntimeError("Run {0} failed on a worker: "
+                                       "{1}".format(published[k], error))
+                finished[k] = (published.pop(k), res)
+
+            while nextset in finished:
+                combo, res = finished.pop(nextset)
+                pmap.set(combo, res)
+                nextset += 1
+
+            queue.reclaim(lease)
+            if len(collected) == 0:
+                time.sleep(poll)
+    finally:
+        queue.close()
+    return pmap
+
+def work(model_call, queue, poll=0.5, heartbeat=None, workerid=None):
+    """ Run tasks from *queue* with *model_call* until the coordinator
+    finishes, and return the number of runs completed.
+
+    `heartbeat::float` is the interval in seconds at which leases are renewed
+    while a run is in progress. It should be well under the coordinator's
+    lease time. By default, leases are not renewed.
+    """
+    if workerid is None:
+        workerid = "{0}-{1}-{2}".format(socket.gethostname(), os.getpid(),
+                                        uuid.uuid4().hex[:8])
+    nruns = 0
+    while True:
+        try:
+            task = queue.claim(workerid)
+        except QueueClosed:
+            return nruns
+        if task is None:
+            time.sleep(poll)
+            continue
+
+        k, names, combo = task
+        stop = threading.Event()
+        if heartbeat is not None:
+            beat = threading.Thread(target=_renew,
+                                    args=(queue, workerid, k, heartbeat, stop))
+            beat.daemon = True
+            beat.start()
+        try:
+            res, error = model_call(dict(zip(names, combo))), None
+        except Exception as e:
+            res = None
+            error = "".join(traceback.format_exception_only(type(e), e)).strip()
+        finally:
+            stop.set()
+        try:
+            queue.complete(workerid, k, res, error)
+        except QueueClosed:
+            return nruns
+        nruns += 1
+
+def _renew(queue, workerid, k, interval, stop):
+    while not stop.wait(interval):
+        try:
+            queue.renew(workerid, k)
+        except Exception:
+            return
+    return
+
+class DirectoryQueue(object):
+    """ Work queue kept in a directory on a filesystem shared by the
+    coordinator and workers.
+
+    Tasks are files in `tasks/`, which workers lease by atomically renaming
+    them into `leases/`. Results are written to `results/`. The lease time is
+    measured from the modification time of the lease file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        for sub in ("tasks", "leases", "results"):
+            d = os.path.join(path, sub)
+            if not os.path.isdir(d):
+                os.makedirs(d, exist_ok=True)
+        return
+
+    def __repr__(self):
+        return "<DirectoryQueue({0})>".format(self.path)
+
+    def _dir(self, sub):
+        return os.path.join(self.path, sub)
+
+    def _write(self, path, obj):
+        fd, tmppath = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmppath, path)
+        return
+
+    # coordinator
+
+    def open(self):
+        """ Clear any previous contents of the queue. """
+        for sub in ("tasks", "leases", "results"):
+            for name in os.listdir(self._dir(sub)):
+                os.remove(os.path.join(self._dir(sub), name))
+        if os.path.exists(self._dir("CLOSED")):
+            os.remove(self._dir("CLOSED"))
+        return
+
+    def put(self, k, names, combo):
+        self._write(os.path.join(self._dir("tasks"), "{0}.pkl".format(k)),
+                    (k, names, combo))
+        return
+
+    def collect(self):
+        """ Return a list of `(k, result, error)` for completed tasks. """
+        collected = []
+        for name in os.listdir(self._dir("results")):
+            path = os.path.join(self._dir("results"), name)
+            try:
+                with open(path, "rb") as f:
+                    collected.append(pickle.load(f))
+                os.remove(path)
+            except (OSError, EOFError):
+                continue
+        return collected
+
+    def reclaim(self, lease):
+        """ Return tasks whose lease has expired to the queue. """
+        now = time.time()
+        for name in os.listdir(self._dir("leases")):
+            path = os.path.join(self._dir("leases"), name)
+            try:
+                if now - os.path.getmtime(path) > lease:
+                    k = name.split(".", 1)[0]
+                    os.rename(path, os.path.join(self._dir("tasks"),
+                                                 "{0}.pkl".format(k)))
+            except OSError:
+                continue
+        return
+
+    def close(self):
+        """ Tell workers that the ensemble is finished. """
+        with open(self._dir("CLOSED"), "w"):
+            pass
+        return
+
+    # worker
+
+    def claim(self, workerid):
+        """ Lease a task, returning `(k, names, combo)`, or None if no task
+        is available. Raises QueueClosed once the coordinator is finished. """
+        names = [n for n in os.listdir(self._dir("tasks")) if n.endswith(".pkl")]
+        for name in sorted(names, key=lambda n: int(n.split(".", 1)[0])):
+            k = name.split(".", 1)[0]
+            leased = os.path.join(self._dir("leases"),
+                                  "{0}.{1}.pkl".format(k, workerid))
+            try:
+                os.rename(os.path.join(self._dir("tasks"), name), leased)
+                os.utime(leased)
+                with open(leased, "rb") as f:
+                    return pickle.load(f)
+            except OSError:
+                continue
+        if os.path.exists(self._dir("CLOSED")):
+            raise QueueClosed()
+        return None
+
+    def renew(self, workerid, k):
+        os.utime(os.path.join(self._dir("leases"),
+                              "{0}.{1}.pkl".format(k, workerid)))
+        return
+
+    def complete(self, workerid, k, res, error=None):
+        self._write(os.path.join(self._dir("results"), "{0}.pkl".format(k)),
+                    (k, res, error))
+        try:
+            os.remove(os.path.join(self._dir("leases"),
+                                   "{0}.{1}.pkl".format(k, workerid)))
+        except OSError:
+            pass
+        return
+
+class SocketQueue(object):
+    """ Work queue served by the coordinator on a TCP *address*
+    `(host, port)`. Workers connect to the same address, authenticating with
+    `authkey::bytes`. Anyone holding the key can send the coordinator
+    pickles, so it should be kept secret. If the coordinator is given no
+    *authkey*, a random one is generated when it opens the queue, and must be
+    passed to the workers from `authkey`.
+
+    Workers started before the coordinator retry connecting for
+    `connect_timeout` seconds. A worker that can no longer reach the
+    coordinator treats the queue as closed.
+    """
+
+    def __init__(self, address, authkey=None, connect_timeout=30.0):
+        self.address = address
+        self.authkey = authkey
+        self.connect_timeout = connect_timeout
+        self._listener = None
+        self._connected = False
+        return
+
+    def __repr__(self):
+        return "<SocketQueue({0}:{1})>".format(*self.address)
+
+    # coordinator
+
+    def open(self):
+        """ Start serving tasks. """
+        self._lock = threading.Lock()
+        self._tasks = []
+        self._leases = {}
+        self._results = []
+        self._closed = False
+        if self.authkey is None:
+            self.authkey = os.urandom(32)
+        self._listener = Listener(self.address, authkey=self.authkey)
+        self.address = self._listener.address
+        self._thread = threading.Thread(target=self._serve)
+        self._thread.daemon = True
+        self._thread.start()
+        return
+
+    def _serve(self):
+        while True:
+            try:
+                conn = self._listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                # e.g. a client with the wrong authkey
+                continue
+            action = None
+            try:
+                # don't let a stalled client hold up the other workers
+                if conn.poll(REQUEST_TIMEOUT):
+                    request = conn.recv()
+                    if not isinstance(request, tuple) or len(request) < 2:
+                        conn.send(("error", "malformed request"))
+                        continue
+                    action = request[0]
+                    try:
+                        reply = self._handle(*request)
+                    except Exception as e:
+                        reply = ("error", "bad request {0}: {1}".format(
+                                          action, e))
+                    conn.send(reply)
+            except Exception:
+                pass
+            finally:
+                conn.close()
+            if action == "stop":
+                return
+
+    def _handle(self, action, workerid, *args):
+        with self._lock:
+            if action == "claim":
+                if len(self._tasks) != 0:
+                    task = self._tasks.pop(0)
+                    self._leases[task[0]] = (task, time.time())
+                    return ("task", task)
+                return ("closed",) if self._closed else ("wait",)
+            elif action == "renew":
+                k, = args
+                if k in self._leases:
+                    self._leases[k] = (self._leases[k][0], time.time())
+                return ("ok",)
+            elif action == "complete":
+                k, res, error = args
+                self._leases.pop(k, None)
+                self._results.append((k, res, error))
+                return ("ok",)
+            elif action == "stop":
+                return ("ok",)
+        return ("error", "unknown action {0}".format(action))
+
+    def put(self, k, names, combo):
+        with self._lock:
+            self._tasks.append((k, names, combo))
+        return
+
+    def collect(self):
+        with self._lock:
+            collected, self._results = self._results, []
+        return collected
+
+    def reclaim(self, lease):
+        now = time.time()
+        with self._lock:
+            for k, (task, t) in list(self._leases.items()):
+                if now - t > lease:
+                    del self._leases[k]
+                    self._tasks.append(task)
+        return
+
+    def close(self):
+        """ Stop serving. Workers see QueueClosed when they next connect. """
+        if self._listener is None:
+            return
+        with self._lock:
+            self._closed = True
+        conn = Client(self.address, authkey=self.authkey)
+        conn.send(("stop", None))
+        conn.recv()
+        conn.close()
+        self._thread.join()
+        self._listener.close()
+        self._listener = None
+        return
+
+    # worker
+
+    def _request(self, *request):
+        if self.authkey is None:
+            raise ValueError("Workers need the coordinator's authkey")
+        deadline = time.time() + self.connect_timeout
+        while True:
+            try:
+                conn = Client(self.address, authkey=self.authkey)
+                break
+            except ConnectionRefusedError:
+                if self._connected or time.time() > deadline:
+                    raise QueueClosed()
+                time.sleep(0.1)
+            except (OSError, EOFError):
+                raise QueueClosed()
+        self._connected = True
+        try:
+            conn.send(request)
+            reply = conn.recv()
+        except (OSError, EOFError):
+            raise QueueClosed()
+        finally:
+            conn.close()
+        if reply[0] == "closed":
+            raise QueueClosed()
+        return reply
+
+    def claim(self, workerid):
+        reply = self._request("claim", workerid)
+        if reply[0] == "task":
+            return reply[1]
+        return None
+
+    def renew(self, workerid, k):
+        self._request("renew", workerid, k)
+        return
+
+    def complete(self, workerid, k, res, error=None):
+        self._request("complete", workerid, k, res, error)
+        return
@@ -0,0 +1,298 @@
+""" Columnar export of ParameterMaps to Arrow, Parquet and HDF5.
+
+Each parameter is written as a column named after it, and the solutions as a
+column named `solution`. Array solutions must share one shape, and are
+stored as fixed-size rows, flattened for Arrow and Parquet. Maps are written
+in chunks of rows, so a map is never converted in one piece.
+
+The readers return a `ColumnarParameterMap`, optionally loading only some
+parameter columns, or only the rows matching FixedParameters, which are then
+dropped from the map as in `ParameterMap.fix_parameters`.
+
+pyarrow is needed for Arrow and Parquet, and h5py for HDF5.
+"""
+
+import json
+import math
+
+from .parametermap import ColumnarParameterMap, KEY_DIGITS, _keyvalue
+from .parameters import FixedParameter
+
+SOLUTION = "solution"
+
+CHUNKSIZE = 65536
+
+# Selected rows of an HDF5 dataset at most this far apart are read together
+MAXGAP = 8
+
+def to_arrow(pmap, chunksize=CHUNKSIZE):
+    """ Return a `pyarrow.Table` holding *pmap*, built from record batches
+    of `chunksize::int` rows. """
+    import pyarrow as pa
+    batches = list(_arrowbatches(pmap, chunksize))
+    if len(batches) == 0:
+        raise ValueError("Cannot export an empty ParameterMap")
+    return pa.Table.from_batches(batches)
+
+def to_parquet(pmap, path, chunksize=CHUNKSIZE, **kw):
+    """ Write *pmap* to a Parquet file at *path*, one row group of
+    `chunksize::int` rows at a time. Other keyword arguments are passed to
+    `pyarrow.parquet.ParquetWriter`, e.g. `compression`. """
+    import pyarrow.parquet as pq
+    writer = None
+    try:
+        for batch in _arrowbatches(pmap, chunksize):
+            if writer is None:
+                writer = pq.ParquetWriter(path, batch.schema, **kw)
+            writer.write_batch(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        raise ValueError("Cannot export an empty ParameterMap")
+    return
+
+def from_arrow(table, parameters=None, fixparams=None):
+    """ Return a ColumnarParameterMap from a `pyarrow.Table` written by
+    `to_arrow`. See `read_parquet`. """
+    names, shape = _arrowmeta(table.schema)
+    keep, fixparams = _selection(names, parameters, fixparams)
+    if len(fixparams) != 0:
+        table = table.filter(_arrowmask(table, fixparams))
+    return _build(keep, [table.column(name) for name in keep],
+                  table.column(SOLUTION), shape)
+
+def read_parquet(path, parameters=None, fixparams=None):
+    """ Read a ParameterMap from a Parquet file written by `to_parquet`.
+
+    Keyword arguments:
+    `parameters::list` are the names of the parameter columns to load
+    (default all). Parameters left out must not be needed to tell solutions
+    apart
+    `fixparams::list` are FixedParameters selecting the rows to load. Row
+    groups are skipped using the file's statistics where possible
+    """
+    import pyarrow.parquet as pq
+    schema = pq.read_schema(path)
+    names, shape = _arrowmeta(schema)
+    keep, fixparams = _selection(names, parameters, fixparams)
+    filters = None
+    if len(fixparams) != 0:
+        filters = []
+        for p in fixparams:
+            lo, hi = _bounds(p.value)
+            filters.extend([(p.name, ">=", lo), (p.name, "<=", hi)])
+    table = pq.read_table(path, columns=keep + [p.name for p in fixparams] +
+                          [SOLUTION], filters=filters)
+    if len(fixparams) != 0:
+        table = table.filter(_arrowmask(table, fixparams))
+    return _build(keep, [table.column(name) for name in keep],
+                  table.column(SOLUTION), shape)
+
+def to_hdf5(pmap, path, group="/", chunksize=CHUNKSIZE):
+    """ Write *pmap* to *group* of the HDF5 file at *path*, one chunk of
+    `chunksize::int` rows at a time. Existing datasets of the same names in
+    *group* are replaced. """
+    import h5py
+    import numpy as np
+    n = len(pmap)
+    if n == 0:
+        raise ValueError("Cannot export an empty ParameterMap")
+    with h5py.File(path, "a") as f:
+        grp = f.require_group(group)
+        grp.attrs["psm.names"] = json.dumps(pmap.names)
+        datasets = None
+        for start in range(0, n, chunksize):
+            stop = min(start + chunksize, n)
+            columns = [_chunk(v, start, stop) for v in pmap.values]
+            solns = _chunk(pmap.solutions, start, stop)
+            if datasets is None:
+                datasets = [_hdf5dataset(grp, name, col, n, chunksize)
+                            for name, col in zip(pmap.names, columns)]
+                datasets.append(_hdf5dataset(grp, SOLUTION, solns, n,
+                                             chunksize))
+            for ds, col in zip(datasets, columns + [solns]):
+                if ds.dtype.kind == "O":
+                    col = col.astype(str).astype(object)
+                ds[start:stop] = col
+    return
+
+def read_hdf5(path, group="/", parameters=None, fixparams=None):
+    """ Read a ParameterMap from *group* of an HDF5 file written by
+    `to_hdf5`. *parameters* and *fixparams* are as for `read_parquet`; only
+    the matching rows of the selected columns are read. """
+    import h5py
+    import numpy as np
+    with h5py.File(path, "r") as f:
+        grp = f[group]
+        names = json.loads(grp.attrs["psm.names"])
+        keep, fixparams = _selection(names, parameters, fixparams)
+        rows = slice(None)
+        if len(fixparams) != 0:
+            mask = np.ones(grp[SOLUTION].shape[0], dtype=bool)
+            for p in fixparams:
+                mask &= _matches(_hdf5read(grp[p.name], slice(None)), p.value)
+            rows = np.nonzero(mask)[0]
+        columns = [_hdf5read(grp[name], rows) for name in keep]
+        solns = _hdf5read(grp[SOLUTION], rows)
+    return _build(keep, columns, solns, None)
+
+def _selection(names, parameters, fixparams):
+    """ Return the names of the parameter columns to load and the list of
+    FixedParameters, checking that they exist. """
+    if isinstance(fixparams, FixedParameter):
+        fixparams = [fixparams]
+    fixparams = list(fixparams or [])
+    if parameters is None:
+        parameters = list(names)
+    for name in list(parameters) + [p.name for p in fixparams]:
+        if name not in names:
+            raise KeyError("Parameter '{0}' not found".format(name))
+    fixnames = [p.name for p in fixparams]
+    keep = [name for name in names if name in parameters and
+            name not in fixnames]
+    return keep, fixparams
+
+def _build(names, columns, solns, shape):
+    """ Return a ColumnarParameterMap of *columns* and *solns*. """
+    columns = [_tonumpy(col) for col in columns]
+    solns = _tonumpy(solns, shape)
+    pmap = ColumnarParameterMap([FixedParameter(name, None) for name in names],
+                                capacity=max(len(solns), 1))
+    if len(solns) == 0:
+        return pmap
+    keys = list(zip(*[col.tolist() for col in columns]))
+    ikeys = list(zip(*[_keycolumn(col) for col in columns]))
+    if len(names) == 0:
+        keys = ikeys = [()]*len(solns)
+    if len(set(ikeys)) != len(ikeys):
+        raise ValueError("Parameters {0} do not identify the solutions "
+                         "uniquely. Load more parameters, or select a slice "
+                         "with fixparams".format(names))
+    if solns.ndim == 1:
+        solns = solns.tolist()
+    pmap._extendnew(keys, ikeys, solns)
+    return pmap
+
+def _keycolumn(col):
+    """ Return the index keys of the values in *col*, normalizing each
+    distinct value once. """
+    import numpy as np
+    values, inverse = np.unique(col, return_inverse=True)
+    keys = np.empty(len(values), dtype=object)
+    keys[:] = [_keyvalue(v) for v in values.tolist()]
+    return keys[inverse.ravel()].tolist()
+
+def _tonumpy(col, shape=None):
+    """ Convert an Arrow column or NumPy array to a NumPy array, restoring
+    the *shape* of flattened array solutions. """
+    import numpy as np
+    if hasattr(col, "combine_chunks"):
+        col = col.combine_chunks()
+        if shape is not None:
+            flat = col.flatten().to_numpy(zero_copy_only=False)
+            return flat.reshape((len(col),) + tuple(shape))
+        col = col.to_numpy(zero_copy_only=False)
+    return np.asarray(col)
+
+def _chunk(seq, start, stop):
+    """ Return rows *start* to *stop* of a column or solution sequence as a
+    NumPy array. """
+    import numpy as np
+    return np.asarray(seq[start:stop])
+
+def _arrowbatches(pmap, chunksize):
+    import pyarrow as pa
+    if SOLUTION in pmap.names:
+        raise ValueError("A parameter may not be named '{0}'".format(SOLUTION))
+    n = len(pmap)
+    shape = None
+    for start in range(0, n, chunksize):
+        stop = min(start + chunksize, n)
+        arrays = [pa.array(_chunk(v, start, stop)) for v in pmap.values]
+        solns = _chunk(pmap.solutions, start, stop)
+        if shape is None:
+            shape = solns.shape[1:]
+        elif solns.shape[1:] != shape:
+            raise ValueError("Array solutions must share one shape")
+        if len(shape) == 0:
+            arrays.append(pa.array(solns))
+        else:
+            size = int(math.prod(shape))
+            arrays.append(pa.FixedSizeListArray.from_arrays(
+                          pa.array(solns.reshape(-1)), size))
+        meta = {"psm.names": json.dumps(pmap.names),
+                "psm.shape": json.dumps(list(shape))}
+        yield pa.RecordBatch.from_arrays(arrays, names=pmap.names + [SOLUTION],
+                                         metadata=meta)
+
+def _arrowmeta(schema):
+    """ Return the parameter names and solution shape recorded in an Arrow
+    *schema*. """
+    meta = schema.metadata or {}
+    if b"psm.names" not in meta:
+        raise ValueError("Not written from a ParameterMap: no psm.names "
+                         "metadata")
+    shape = tuple(json.loads(meta[b"psm.shape"]))
+    return json.loads(meta[b"psm.names"]), (shape if len(shape) != 0 else None)
+
+def _arrowmask(table, fixparams):
+    import numpy as np
+    import pyarrow as pa
+    mask = np.ones(table.num_rows, dtype=bool)
+    for p in fixparams:
+        mask &= _matches(_tonumpy(table.column(p.name)), p.value)
+    return pa.array(mask)
+
+def _bounds(value):
+    """ Return a range around *value* wide enough to include values that
+    round to it in the index. """
+    if isinstance(value, float) and math.isfinite(value):
+        tol = abs(value) * 10.0**(1-KEY_DIGITS)
+        return value - tol, value + tol
+    return value, value
+
+def _matches(column, value):
+    """ Return a boolean array of the entries of *column* equal to *value*
+    as index keys. """
+    import numpy as np
+    target = _keyvalue(value)
+    if column.dtype.kind == "f":
+        lo, hi = _bounds(float(value))
+        near = (column >= lo) & (column <= hi)
+        rows = np.nonzero(near)[0]
+        near[rows] = [_keyvalue(float(v)) == target for v in column[rows]]
+        return near
+    if column.dtype.kind in "SO":
+        column = column.astype(str)
+    return column == value
+
+def _hdf5dataset(grp, name, chunk, n, chunksize):
+    import h5py
+    if name in grp:
+        del grp[name]
+    dtype = chunk.dtype
+    if dtype.kind in "UO":
+        dtype = h5py.string_dtype()
+    return grp.create_dataset(name, shape=(n,) + chunk.shape[1:], dtype=dtype,
+                              chunks=(min(chunksize, n),) + chunk.shape[1:])
+
+def _hdf5read(ds, rows):
+    """ Read *rows* (a slice or sorted row numbers) of the dataset *ds*. """
+    import numpy as np
+    strings = ds.dtype.kind == "O"
+    if strings:
+        ds = ds.asstr()
+    if isinstance(rows, slice):
+        return np.asarray(ds[rows])
+    if len(rows) == 0:
+        return np.empty((0,) + ds.shape[1:], dtype=object if strings
+                        else ds.dtype)
+    # slices are much faster than h5py's point selection, so read runs of
+    # nearby rows, each as one slice
+    breaks = np.nonzero(np.diff(rows) > MAXGAP)[0] + 1
+    parts = []
+    for run in np.split(rows, breaks):
+        block = np.asarray(ds[run[0]:run[-1]+1])
+        parts.append(block[run - run[0]])
+    return np.concatenate(parts)
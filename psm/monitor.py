@@ -0,0 +1,131 @@
+""" Instrumentation of ensemble runs. """
+
+import threading
+import time
+import tracemalloc
+
+# number of runs in this process measuring memory, and whether they started
+# tracemalloc (and so must stop it)
+_tracing = {"runs": 0, "started": False}
+_tracelock = threading.Lock()
+
+class RunMonitor(object):
+    """ Instruments the runs of an ensemble.
+
+    When passed to `fillspace` or `latin_hypercube`, the wall time, CPU time
+    and (optionally) peak memory of each run are stored as annotations on the
+    ParameterMap (see `ParameterMap.annotation`).
+
+    Keyword arguments:
+    `progress::function` is called as `progress(done, total, elapsed, eta)`
+    in the calling process as runs complete. *eta* is an estimate of the
+    seconds remaining, or None.
+    `before_run::function` is called as `before_run(parameter_dict)`
+    immediately before each model call, and `after_run::function` as
+    `after_run(parameter_dict, result, stats)` immediately after it, in the
+    thread or process executing the run. Both must be picklable to be used
+    with a process pool.
+    `memory::bool` records the peak memory allocated by each run using
+    `tracemalloc`. Runs sharing a process through a thread pool are not
+    separated.
+    """
+
+    def __init__(self, progress=None, before_run=None, after_run=None,
+                 memory=False):
+        self.progress = progress
+        self.before_run = before_run
+        self.after_run = after_run
+        self.memory = memory
+        self.start(None)
+        return
+
+    def __repr__(self):
+        return "<RunMonitor({0}/{1})>".format(self.done, self.total)
+
+    def start(self, total):
+        """ Reset counters for an ensemble of *total* runs. """
+        self.total = total
+        self.done = 0
+        self.skipped = 0
+        self._t0 = time.perf_counter()
+        return
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self._t0
+
+    def eta(self):
+        """ Estimate the remaining time in seconds from the mean time per
+        completed run. """
+        ran = self.done - self.skipped
+        if self.total is None or ran == 0:
+            return None
+        return self.elapsed / ran * (self.total - self.done)
+
+    def skip(self):
+        """ Count a run that was not needed. """
+        self.done += 1
+        self.skipped += 1
+        return
+
+    def update(self, n=1):
+        """ Count *n* completed runs and report progress. """
+        self.done += n
+        if self.progress is not None:
+            self.progress(self.done, self.total, self.elapsed, self.eta())
+        return
+
+    def timer(self):
+        """ Return the picklable callable that times runs in workers. """
+        return RunTimer(self.before_run, self.after_run, self.memory)
+
+class RunTimer(object):
+    """ Calls a model, invoking hooks and measuring wall time, CPU time and
+    optionally peak memory. """
+
+    def __init__(self, before_run=None, after_run=None, memory=False):
+        self.before_run = before_run
+        self.after_run = after_run
+        self.memory = memory
+
+    def __call__(self, model_call, parameter_dict):
+        """ Return `(result, stats)` from calling *model_call*. """
+        if self.before_run is not None:
+            self.before_run(parameter_dict)
+        if self.memory:
+            _starttrace()
+        try:
+            if self.memory:
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+            t0, c0 = time.perf_counter(), time.thread_time()
+            res = model_call(parameter_dict)
+            stats = {"wall": time.perf_counter() - t0,
+                     "cpu": time.thread_time() - c0}
+            if self.memory:
+                stats["peak_memory"] = tracemalloc.get_traced_memory()[1] - base
+        finally:
+            if self.memory:
+                _stoptrace()
+
+        if self.after_run is not None:
+            self.after_run(parameter_dict, res, stats)
+        return res, stats
+
+def _starttrace():
+    """ Start tracemalloc for a run unless it is already tracing. """
+    with _tracelock:
+        if _tracing["runs"] == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing["started"] = True
+        _tracing["runs"] += 1
+    return
+
+def _stoptrace():
+    """ Stop tracemalloc after the last run if a run started it. """
+    with _tracelock:
+        _tracing["runs"] -= 1
+        if _tracing["runs"] == 0 and _tracing["started"]:
+            tracemalloc.stop()
+            _tracing["started"] = False
+    return
@@ -0,0 +1,95 @@
+""" Helpers for dispatching model runs to `concurrent.futures` executors. """
+
+import collections
+import concurrent.futures
+import os
+import pickle
+
+def get_executor(executor=None, workers=None):
+    """ Resolve *executor* into a `concurrent.futures.Executor`.
+
+    `executor` may be None, "thread", "process", or an existing Executor
+    instance. If both *executor* and *workers* are None, returns None and runs
+    proceed serially. Returns a pair `(executor, owned)`, where *owned*
+    indicates that the caller is responsible for shutting the executor down.
+    """
+    if executor is None and workers is None:
+        return None, False
+    elif executor is None or executor == "thread":
+        return concurrent.futures.ThreadPoolExecutor(max_workers=workers), True
+    elif executor == "process":
+        return concurrent.futures.ProcessPoolExecutor(max_workers=workers), True
+    elif isinstance(executor, concurrent.futures.Executor):
+        return executor, False
+    raise ValueError("executor must be 'thread', 'process', or a "
+                     "concurrent.futures.Executor (got {0})".format(executor))
+
+def check_picklable(func, executor):
+    """ Raise a TypeError if *func* must be pickled by *executor* but can't
+    be. """
+    if isinstance(executor, concurrent.futures.ProcessPoolExecutor):
+        try:
+            pickle.dumps(func)
+        except Exception as e:
+            raise TypeError("model_call cannot be sent to a process pool ({0}). "
+                            "Define it at module level, or use a thread "
+                            "pool".format(e))
+    return
+
+def imap(func, iterable, executor=None, workers=None, maxpending=None,
+         ordered=True):
+    """ Yield `(item, func(item))` for each item in *iterable*.
+
+    Results are yielded in input order, or as they complete if *ordered* is
+    False. When an executor is requested, at most *maxpending* calls are in
+    flight at once (default: twice the number of workers), so that memory use
+    does not grow with the length of *iterable*.
+    """
+    pool, owned = get_executor(executor, workers)
+    if pool is None:
+        for item in iterable:
+            yield item, func(item)
+        return
+
+    check_picklable(func, pool)
+    if maxpending is None:
+        nworkers = getattr(pool, "_max_workers", None) or os.cpu_count() or 1
+        maxpending = 2*nworkers
+
+    if ordered:
+        pending = collections.deque()
+        drain = _drain_ordered
+    else:
+        pending = {}
+        drain = _drain_completed
+    try:
+        for item in iterable:
+            future = pool.submit(func, item)
+            if ordered:
+                pending.append((item, future))
+            else:
+                pending[future] = item
+            if len(pending) >= maxpending:
+                for result in drain(pending):
+                    yield result
+        while len(pending) != 0:
+            for result in drain(pending):
+                yield result
+    finally:
+        futures = pending if not ordered else [f for _, f in pending]
+        for future in futures:
+            future.cancel()
+        if owned:
+            pool.shutdown(wait=True)
+
+def _drain_ordered(pending):
+    """ Wait for the oldest pending call. """
+    item, future = pending.popleft()
+    yield item, future.result()
+
+def _drain_completed(pending):
+    """ Wait for at least one pending call to complete. """
+    done, _ = concurrent.futures.wait(pending,
+                        return_when=concurrent.futures.FIRST_COMPLETED)
+    for future in done:
+        yield pending.pop(future), future.result()
@@ -2,17 +2,61 @@ import collections.abc
 import copy
 import itertools
 from functools import reduce
+import json
+import math
+import numbers
 import operator
+import os
+import pickle
 import sqlite3
 
+from .parallel import imap
+
+# Float parameter values are rounded to this many significant digits in the
+# index, so values matching to this precision are usually the same key
+KEY_DIGITS = 10
+
+def _keyvalue(value):
+    """ Normalize a parameter value for use in the index. Floats are rounded to
+    `KEY_DIGITS` significant digits so that rounding noise from
+    `Parameter.partition` doesn't cause lookups to miss.
+
+    This matches values by bucket, not within a tolerance: two floats that
+    straddle a rounding boundary (e.g. 0.12345678905 and the float just below
+    it) are different keys however close they are. Partition values and
+    values computed the same way as the stored ones are far from boundaries
+    in practice, but values from independent calculations may not be.
+    """
+    if isinstance(value, float) and value != 0 and math.isfinite(value):
+        return float("{0:.{1}g}".format(value, KEY_DIGITS))
+    return value
+
+def _indexkey(key):
+    return tuple(_keyvalue(k) for k in key)
+
+def _pyvalue(value):
+    """ Convert NumPy scalars to the equivalent Python scalar. """
+    if hasattr(value, "item") and not isinstance(value, (str, bytes)):
+        return value.item()
+    return value
+
 class ParameterMap(object):
     """ Organized as a stack of parameter combinations and solutions. """
 
     def __init__(self, parameters, solntype=None):
         self.names = [p.name for p in parameters]
-        self.values = [[] for p in parameters]
-        self.solutions = []
         self.solntype = solntype
+        self.annotations = {}
+        self.failures = {}
+        self._index = {}
+        self._valueindex = None
+        self._shared = False
+        self._init_storage(len(parameters))
+        return
+
+    def _init_storage(self, n):
+        self.values = [[] for _ in range(n)]
+        self.solutions = []
         return
 
     def __repr__(self):
@@ -24,39 +68,251 @@ class ParameterMap(object):
         return "ParameterMap[{0}]".format(childtypestr)
 
     def __getitem__(self, key):
-        i = 0
-        while i < len(self):
-            found = True
-            for j,k in enumerate(key):
-                if self.values[j][i] != k:
-                    found = False
-                    break
+        return self.solutions[self._row(key)]
 
-            if found:
-                return self.solutions[i]
-            else:
-                i += 1
-
-        raise KeyError("No solution exists for parameters {0}".format(key))
+    def __contains__(self, key):
+        try:
+            self._row(key)
+        except KeyError:
+            return False
+        return True
 
     def __setitem__(self, key, soln):
-        if len(key) != len(self.values):
+        """ Store *soln* at *key*, replacing any existing solution. """
+        if len(key) != len(self.names):
             raise KeyError("Key length must equal ParameterMap dimension "
-                           "({0})".format(len(self.values)))
+                           "({0})".format(len(self.names)))
+        self._checktype(soln)
+        ikey = _indexkey(key)
+        i = self._index.get(ikey)
+        if i is None:
+            self._unshare()
+            i = len(self)
+            # index the key only once storage has accepted the solution
+            self._append(key, soln)
+            self._index[ikey] = i
+            if self._valueindex is not None:
+                for j, rows in enumerate(self._valueindex):
+                    if rows is not None:
+                        rows.setdefault(ikey[j], set()).add(i)
+        else:
+            self._replace(i, soln)
+        return
+
+    def _checktype(self, soln):
         if (type(soln) is not self.solntype) and (soln is not None):
             if self.solntype is None:
                 self.solntype = type(soln)
             else:
                 raise TypeError("Solutions must be of type {0} or "
                                 "None".format(self.solntype))
+        return
+
+    def _append(self, key, soln):
         for j,k in enumerate(key):
             self.values[j].append(k)
         self.solutions.append(soln)
         return
 
+    def _replace(self, i, soln):
+        self.solutions[i] = soln
+        return
+
+    def _unshare(self):
+        """ Take a private copy of parameter values and index shared with a
+        derived map before adding rows. """
+        if self._shared:
+            self._index = dict(self._index)
+            self._valueindex = None
+            self._copy_values()
+            self._shared = False
+        return
+
+    def _copy_values(self):
+        self.values = [list(v) for v in self.values]
+        return
+
+    def _snapshot(self):
+        """ Return the solutions as a sequence unaffected by later changes
+        to this map. Only references are copied, and lazy solutions are not
+        computed. """
+        if isinstance(self.solutions, LazySolutions):
+            return self.solutions.copy()
+        return list(self.solutions)
+
+    def _derive(self, solutions):
+        """ Return a ParameterMap holding *solutions* that shares this map's
+        parameter values and index. """
+        if self._index is None:
+            # views build their index on first use
+            self._reindex()
+        newmap = ParameterMap([])
+        newmap.names = list(self.names)
+        newmap.values = self.values
+        newmap.solutions = solutions
+        newmap.annotations = {i: dict(info)
+                              for i, info in self.annotations.items()}
+        newmap.failures = dict(self.failures)
+        newmap._index = self._index
+        newmap._valueindex = self._valueindex
+        newmap._shared = self._shared = True
+        return newmap
+
+    def _row(self, key):
+        """ Return the row number of the solution at *key*. """
+        try:
+            return self._index[_indexkey(key)]
+        except (KeyError, TypeError):
+            raise KeyError("No solution exists for parameters {0}".format(key))
+
+    def _reindex(self):
+        """ Rebuild the index from `values`. """
+        self._index = {}
+        for i, key in enumerate(zip(*self.values)):
+            self._index.setdefault(_indexkey(key), i)
+        self._valueindex = None
+        return
+
     def set(self, key, soln):
         return self.__setitem__(key, soln)
 
+    def annotate(self, key, **info):
+        """ Record *info* about the run at *key*, such as the run statistics
+        collected by a `RunMonitor`. """
+        self.annotations.setdefault(self._row(key), {}).update(info)
+        return
+
+    def annotation(self, key):
+        """ Return a dictionary of the information recorded about the run at
+        *key*. """
+        return self.annotations.get(self._row(key), {})
+
+    def fail(self, key, failure):
+        """ Record that the run at *key* failed, with a `RunFailure`
+        describing why. Failed runs have no solution, and are kept in the
+        `failures` dictionary until they are run successfully (see
+        `rerun_failures`). A copy of *failure* is stored, with its `combo`
+        set to *key*. """
+        if len(key) != len(self.names):
+            raise KeyError("Key length must equal ParameterMap dimension "
+                           "({0})".format(len(self.names)))
+        failure = copy.copy(failure)
+        failure.combo = tuple(key)
+        self.failures[_indexkey(key)] = failure
+        return
+
+    def extend(self, keys, solns):
+        """ Set each of *keys* to the corresponding solution in *solns*. """
+        keys = list(keys)
+        if len(keys) != len(solns):
+            raise ValueError("Received {0} keys but {1} solutions".format(
+                             len(keys), len(solns)))
+        for key, soln in zip(keys, solns):
+            self.__setitem__(key, soln)
+        return
+
+    def _extendnew(self, keys, ikeys, solns):
+        """ Append rows for *keys*, whose index keys *ikeys* are not yet in
+        the map. """
+        if len(keys) == 0:
+            return
+        self._unshare()
+        self._valueindex = None
+        for key, ikey, soln in zip(keys, ikeys, solns):
+            self._checktype(soln)
+            i = len(self)
+            self._append(key, soln)
+            self._index[ikey] = i
+        return
+
+    def merge(self, *maps, duplicates="error"):
+        """ Add the solutions of other ParameterMaps to this one in place and
+        return it.
+
+        Parameters are matched by name, so the maps may order their
+        parameters differently, but must have the same parameter names. New
+        solutions are copied in bulk where the storage supports it.
+        Annotations and recorded failures are carried over. Numeric solution
+        types are promoted to a common type (e.g. int and float solutions are
+        merged as floats).
+
+        Keyword arguments:
+        `duplicates::string` decides what happens to a key present in more
+        than one map: "first" keeps the earliest solution, "last" keeps the
+        latest, and "error" raises a KeyError
+        """
+        if duplicates not in ("first", "last", "error"):
+            raise ValueError("duplicates must be 'first', 'last' or 'error' "
+                             "(got {0})".format(duplicates))
+        for other in maps:
+            if sorted(other.names) != sorted(self.names):
+                raise KeyError("Cannot merge parameters {0} into {1}".format(
+                               other.names, self.names))
+        orders = [[other.names.index(name) for name in self.names]
+                  for other in maps]
+        # reuse the other maps' indexes rather than rounding keys again
+        rowkeys = []
+        for other, order in zip(maps, orders):
+            ikeys = _rowkeys(other)
+            if order != list(range(len(order))):
+                ikeys = [tuple(ikey[j] for j in order) for ikey in ikeys]
+            rowkeys.append(ikeys)
+        if duplicates == "error":
+            # check every map before changing anything
+            seen = set(self._index)
+            for other, order, ikeys in zip(maps, orders, rowkeys):
+                for i, ikey in enumerate(ikeys):
+                    if ikey in seen:
+                        raise KeyError("Duplicate solution for parameters "
+                                       "{0}".format(tuple(other.values[j][i]
+                                                          for j in order)))
+                    seen.add(ikey)
+        convert = _reconcile(self, maps)
+
+        for other, order, ikeys in zip(maps, orders, rowkeys):
+            reorder = order != list(range(len(order)))
+            keys = list(zip(*[other.values[j] for j in order]))
+            if len(self.names) == 0:
+                keys = [()]*len(other)
+            solns = other.solutions
+            target = convert or self.solntype or other.solntype
+            if target is not None and issubclass(target, numbers.Number):
+                # also converts NumPy scalars read from columnar storage
+                solns = [s if s is None or type(s) is target else target(s)
+                         for s in solns]
+            otherannotations = other.annotations
+
+            index = self._index
+            newrows = []
+            for i, ikey in enumerate(ikeys):
+                if ikey not in index:
+                    newrows.append(i)
+                elif duplicates == "last":
+                    self.__setitem__(keys[i], solns[i])
+                    self.failures.pop(ikey, None)
+                    if i in otherannotations:
+                        self.annotate(keys[i], **otherannotations[i])
+
+            if len(newrows) == len(keys):
+                self._extendnew(keys, ikeys, list(solns))
+            else:
+                self._extendnew([keys[i] for i in newrows],
+                                [ikeys[i] for i in newrows],
+                                [solns[i] for i in newrows])
+            for i in newrows:
+                self.failures.pop(ikeys[i], None)
+                if i in otherannotations:
+                    self.annotate(keys[i], **otherannotations[i])
+            for ikey, failure in other.failures.items():
+                if reorder:
+                    ikey = tuple(ikey[j] for j in order)
+                    if getattr(failure, "combo", None) is not None:
+                        failure = copy.copy(failure)
+                        failure.combo = tuple(failure.combo[j] for j in order)
+                if ikey not in self._index:
+                    self.failures.setdefault(ikey, failure)
+        return self
+
     def __iter__(self):
         return (soln for soln in self.solutions)
 
@@ -66,34 +322,825 @@ class ParameterMap(object):
     def copy(self):
         return copy.deepcopy(self)
 
-    def apply(self, func, *args, **kwargs):
+    def apply(self, func, *args, lazy=False, executor=None, workers=None,
+              **kwargs):
         """ Apply `func::function` to solutions and return a new ParameterMap.
+
+        The new map shares parameter values with this one, and solutions are
+        not copied before *func* is applied.
+
+        Keyword arguments:
+        `lazy::bool` defers calling *func* on a solution until it is accessed.
+        The solutions are those of this map when `apply` is called, and the
+        solution type of the new map is unknown (None) until a solution is set
+        `executor::string,Executor` and `workers::int` run *func* concurrently,
+        as for `fillspace`
         """
-        newmap = self.copy()
-        for i in range(len(newmap)):
-            newmap.solutions[i] = func(newmap.solutions[i], *args, **kwargs)
+        call = _Apply(func, args, kwargs)
+        if lazy:
+            if executor is not None or workers is not None:
+                raise ValueError("lazy apply cannot use an executor")
+            return self._derive(LazySolutions(self._snapshot(), call))
+
+        newmap = self._derive([])
+        for _, res in imap(call, self.solutions, executor=executor,
+                                   workers=workers):
+            newmap._checktype(res)
+            newmap.solutions.append(res)
         return newmap
 
     def fix_parameters(self, *fixparams):
-        """ Return a view only containing solutions with *fixparams* set. """
+        """ Return a view only containing solutions with *fixparams* set.
+        *fixparams* may be FixedParameters, or lists of FixedParameters. """
+        fixparams = _flatten(fixparams)
+        rowsets = []
+        for p in fixparams:
+            try:
+                j = self.names.index(p.name)
+            except ValueError:
+                raise KeyError("Parameter '{0}' not found".format(p.name))
+            rowsets.append(self._valuerows(j).get(_keyvalue(p.value), set()))
+
+        if len(rowsets) == 0:
+            rows = range(len(self))
+        else:
+            rowsets.sort(key=len)
+            rows = sorted(rowsets[0].intersection(*rowsets[1:]))
         fixnames = [p.name for p in fixparams]
-        fix_indices = [self.names.index(n) for n in fixnames]
+        columns = [j for j, n in enumerate(self.names) if n not in fixnames]
+        return ParameterMapView(self, rows, columns)
 
-        npars = len(self.names)
-        solns, values = [], []
-        for i, soln in enumerate(self.solutions):
-            for idx in fix_indices:
-                if fixparams[idx].value == self.values[idx][i]:
-                    solns.append(soln)
-                    values.append([self.values[j][i] for j in range(npars)])
+    def to_ndarray(self, fixparams=None, fill=None, masked=False,
+                   coords=False):
+        """ Return the solutions as a dense array with one axis per parameter,
+        ordered as in `names`, with coordinates along each axis sorted.
 
-        remaining_names = [n for n in self.names if n not in fixnames]
-        newmap = ParameterMap([])
-        newmap.names = remaining_names
-        newmap.solutions = solns
-        newmap.values = values
-        newmap.solntype = self.solntype
-        return newmap
+        Keyword arguments:
+        `fixparams::list` are FixedParameters to hold constant, reducing the
+        dimensionality of the array
+        `fill` is stored in cells with no solution (default NaN, or None for
+        non-numeric solutions)
+        `masked::bool` returns a masked array with empty cells masked
+        `coords::bool` also returns a list of the coordinates along each axis
+        """
+        import numpy as np
+        pmap = self if not fixparams else self.fix_parameters(fixparams)
+
+        axes, cells = [], []
+        for v in pmap.values:
+            # bucket values as the index does, so near-equal floats share a cell
+            keys = [_keyvalue(_pyvalue(x)) for x in v]
+            axis, inverse = np.unique(np.asarray(keys), return_inverse=True)
+            axes.append(axis)
+            cells.append(inverse.ravel())
+        cells = tuple(cells)
+        shape = tuple(len(axis) for axis in axes)
+
+        solns = pmap.solutions
+        if not isinstance(solns, (np.ndarray, _Subset)):
+            solns = list(solns)
+        solns = np.asarray(solns)
+
+        filled = np.zeros(shape, dtype=bool)
+        filled[cells] = True
+        complete = filled.all()
+        dtype = solns.dtype
+        if not complete and not masked and fill is None and dtype.kind in "biu":
+            dtype = np.dtype(float)
+        arr = np.empty(shape + solns.shape[1:], dtype=dtype)
+        arr[cells] = solns
+
+        if not complete:
+            if masked:
+                mask = np.zeros(arr.shape, dtype=bool)
+                mask[~filled] = True
+                arr = np.ma.array(arr, mask=mask)
+            else:
+                if fill is None:
+                    fill = np.nan if dtype.kind in "fc" else None
+                arr[~filled] = fill
+
+        if coords:
+            return arr, axes
+        return arr
+
+    def extract_array(self, fixparams=None, **kwargs):
+        """ Alias for `to_ndarray`. """
+        return self.to_ndarray(fixparams, **kwargs)
+
+    def to_arrow(self, chunksize=65536):
+        """ Return a `pyarrow.Table` with a column for each parameter and
+        one for the solutions (see `psm.io`). """
+        from .io import to_arrow
+        return to_arrow(self, chunksize=chunksize)
+
+    def to_parquet(self, path, chunksize=65536, **kw):
+        """ Write the map to a Parquet file at *path*, *chunksize* rows at a
+        time (see `psm.io`). """
+        from .io import to_parquet
+        return to_parquet(self, path, chunksize=chunksize, **kw)
+
+    def to_hdf5(self, path, group="/", chunksize=65536):
+        """ Write the map to *group* of an HDF5 file at *path*, *chunksize*
+        rows at a time (see `psm.io`). """
+        from .io import to_hdf5
+        return to_hdf5(self, path, group=group, chunksize=chunksize)
+
+    def reduce(self, over, func="mean", q=None):
+        """ Return a ParameterMap with solutions reduced over the parameters
+        named in `over::list`, holding one solution for each distinct
+        combination of the other parameters.
+
+        `func` is "sum", "mean", "min", "max", "std", "median", "quantile"
+        (with `q::float`), which are vectorized with NumPy, or a function
+        called with an array of the solutions in each group.
+        """
+        from .reduction import groupreduce
+        return groupreduce(self, over, func=func, q=q)
+
+    def groupby(self, names):
+        """ Return a list of `(key, view)` pairs, one for each distinct
+        combination *key* of the parameters *names*, where *view* holds the
+        solutions with those values. The map is scanned once. """
+        from .reduction import groupby
+        return groupby(self, names)
+
+    def interpolate(self, points, parameters=None, method=None):
+        """ Return solutions interpolated at *points*, an array with one row
+        of parameter values per point, ordered as in `names`. *parameters*
+        and *method* are as for `Surrogate`, which should be used directly
+        to interpolate the same map repeatedly. """
+        from .surrogate import Surrogate
+        return Surrogate(self, parameters=parameters, method=method)(points)
+
+    def _valuerows(self, j):
+        """ Return a dictionary mapping each value of parameter *j* to the set
+        of rows where it occurs. """
+        if self._valueindex is None:
+            self._valueindex = [None for _ in self.names]
+        if self._valueindex[j] is None:
+            rows = {}
+            for i, v in enumerate(self.values[j]):
+                rows.setdefault(_keyvalue(v), set()).add(i)
+            self._valueindex[j] = rows
+        return self._valueindex[j]
+
+class ParameterMapView(ParameterMap):
+    """ Read-only view onto *rows* of a *parent* ParameterMap, containing the
+    parameter *columns* (indices into `parent.names`). Parameter values and
+    solutions are read from the parent's storage rather than copied. """
+
+    def __init__(self, parent, rows, columns):
+        self.parent = parent
+        self.rows = rows
+        self.columns = columns
+        self.names = [parent.names[j] for j in columns]
+        self.solntype = parent.solntype
+        self.failures = {}
+        self._index = None
+        self._valueindex = None
+        self._shared = False
+        return
+
+    @property
+    def values(self):
+        parentvalues = self.parent.values
+        return [_Subset(parentvalues[j], self.rows) for j in self.columns]
+
+    @property
+    def solutions(self):
+        return _Subset(self.parent.solutions, self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __setitem__(self, key, soln):
+        raise TypeError("ParameterMapView is read-only")
+
+    @property
+    def annotations(self):
+        parentannotations = self.parent.annotations
+        return {i: parentannotations[row] for i, row in enumerate(self.rows)
+                if row in parentannotations}
+
+    def annotate(self, key, **info):
+        raise TypeError("ParameterMapView is read-only")
+
+    def fail(self, key, failure):
+        raise TypeError("ParameterMapView is read-only")
+
+    def merge(self, *maps, duplicates="error"):
+        raise TypeError("ParameterMapView is read-only")
+
+    def annotation(self, key):
+        return self.parent.annotations.get(self.rows[self._row(key)], {})
+
+    def _row(self, key):
+        if self._index is None:
+            self._reindex()
+        return super(ParameterMapView, self)._row(key)
+
+    def copy(self):
+        """ Return an independent ParameterMap with the contents of the view.
+        """
+        return _inmemory(self)
+
+class _Subset(object):
+    """ Sequence presenting the items of *seq* at *rows*. """
+
+    def __init__(self, seq, rows):
+        self.seq = seq
+        self.rows = rows
+
+    def __repr__(self):
+        return "<_Subset({0} of {1})>".format(len(self.rows), len(self.seq))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return _Subset(self.seq, self.rows[i])
+        return self.seq[self.rows[i]]
+
+    def __iter__(self):
+        return (self.seq[i] for i in self.rows)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __array__(self, dtype=None, copy=None):
+        import numpy as np
+        if isinstance(self.seq, np.ndarray):
+            return np.asarray(self.seq[np.asarray(self.rows, dtype=int)],
+                              dtype=dtype)
+        return np.array(list(self), dtype=dtype)
+
+def _flatten(items):
+    """ Flatten nested lists and tuples of FixedParameters. """
+    flat = []
+    for item in items:
+        if isinstance(item, (list, tuple)):
+            flat.extend(_flatten(item))
+        else:
+            flat.append(item)
+    return flat
+
+class _Apply(object):
+    """ Picklable callable applying *func* to a single solution. """
+
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def __call__(self, soln):
+        return self.func(soln, *self.args, **self.kwargs)
+
+_PENDING = object()
+
+class LazySolutions(object):
+    """ Sequence of solutions computed from *source* by *func* on first
+    access. """
+
+    def __init__(self, source, func):
+        self.source = source
+        self.func = func
+        self._values = [_PENDING]*len(source)
+        return
+
+    def __repr__(self):
+        computed = sum(1 for v in self._values if v is not _PENDING)
+        return "<LazySolutions({0}/{1} computed)>".format(computed, len(self))
+
+    def __len__(self):
+        return len(self._values)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        value = self._values[i]
+        if value is _PENDING:
+            value = self._values[i] = self.func(self.source[i])
+        return value
+
+    def __setitem__(self, i, value):
+        self._values[i] = value
+        return
+
+    def copy(self):
+        """ Return a copy that shares *source* and the solutions computed so
+        far. """
+        lazy = LazySolutions(self.source, self.func)
+        lazy._values = list(self._values)
+        return lazy
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def append(self, value):
+        self._values.append(value)
+        return
+
+class ColumnarParameterMap(ParameterMap):
+    """ ParameterMap storing each parameter column and the solutions in
+    contiguous NumPy arrays.
+
+    All solutions must share one dtype and shape, taken from `solntype` if it
+    is a scalar type and otherwise from the first solution. `values` and
+    `solutions` are views onto the underlying storage, which grows
+    geometrically as solutions are added.
+    """
+
+    def __init__(self, parameters, solntype=None, capacity=64):
+        self._capacity = max(int(capacity), 1)
+        super(ColumnarParameterMap, self).__init__(parameters, solntype=solntype)
+        return
+
+    def _init_storage(self, n):
+        self._columns = [None for _ in range(n)]
+        self._solns = None
+        self._n = 0
+        return
+
+    @property
+    def values(self):
+        import numpy as np
+        if self._solns is None:
+            return [np.empty(0) for _ in self._columns]
+        return [col[:self._n] for col in self._columns]
+
+    @property
+    def solutions(self):
+        import numpy as np
+        if self._solns is None:
+            return np.empty(0)
+        return self._solns[:self._n]
+
+    def __len__(self):
+        return self._n
+
+    def _checktype(self, soln):
+        if soln is None:
+            raise TypeError("ColumnarParameterMap cannot store None solutions")
+        if self.solntype is None:
+            self.solntype = type(soln)
+        return
+
+    def _allocate(self, key, soln):
+        import numpy as np
+        self._columns = [np.empty(self._capacity, dtype=_coldtype(k))
+                         for k in key]
+        if isinstance(self.solntype, type) and \
+                issubclass(self.solntype, (bool, int, float, complex, np.generic)):
+            soln = np.asarray(soln, dtype=self.solntype)
+        else:
+            soln = np.asarray(soln)
+        self._solns = np.empty((self._capacity,) + soln.shape, dtype=soln.dtype)
+        return
+
+    def _grow(self):
+        import numpy as np
+        self._capacity *= 2
+        for j, col in enumerate(self._columns):
+            self._columns[j] = np.resize(col, self._capacity)
+        solns = np.empty((self._capacity,) + self._solns.shape[1:],
+                         dtype=self._solns.dtype)
+        solns[:self._n] = self._solns[:self._n]
+        self._solns = solns
+        return
+
+    def _append(self, key, soln):
+        import numpy as np
+        if self._solns is None:
+            self._allocate(key, soln)
+        elif self._n == len(self._solns):
+            self._grow()
+        for j, k in enumerate(key):
+            col = self._columns[j]
+            dtype = _promote(col.dtype, _coldtype(k))
+            if dtype != col.dtype:
+                col = self._columns[j] = col.astype(dtype)
+            col[self._n] = k
+        self._solns[self._n] = soln
+        self._n += 1
+        return
+
+    def _replace(self, i, soln):
+        self._solns[i] = soln
+        return
+
+    def extend(self, keys, solns):
+        """ Set each of *keys* to the corresponding solution in *solns*.
+        Batches of new keys are copied into storage in bulk. """
+        keys = [tuple(key) for key in keys]
+        ikeys = [_indexkey(key) for key in keys]
+        n = len(keys)
+        if (n == 0 or len(solns) != n or len(set(ikeys)) != n or
+                any(len(key) != len(self.names) for key in keys) or
+                any(ikey in self._index for ikey in ikeys) or
+                any(soln is None for soln in solns)):
+            return super(ColumnarParameterMap, self).extend(keys, solns)
+        self._extendnew(keys, ikeys, solns)
+        return
+
+    def _extendnew(self, keys, ikeys, solns):
+        if len(keys) == 0:
+            return
+        if any(soln is None for soln in solns):
+            return super(ColumnarParameterMap, self)._extendnew(keys, ikeys,
+                                                                solns)
+        import numpy as np
+        n = len(keys)
+        self._checktype(solns[0])
+        self._unshare()
+        if self._solns is None:
+            self._allocate(keys[0], solns[0])
+        while self._n + n > len(self._solns):
+            self._grow()
+
+        start = self._n
+        for j, col in enumerate(self._columns):
+            colvalues = [key[j] for key in keys]
+            dtype = _promote(col.dtype, _coldtype(colvalues))
+            if dtype != col.dtype:
+                col = self._columns[j] = col.astype(dtype)
+            col[start:start+n] = colvalues
+        self._solns[start:start+n] = np.asarray(solns)
+        self._n += n
+
+        for i, ikey in enumerate(ikeys, start):
+            self._index[ikey] = i
+        if self._valueindex is not None:
+            for j, rows in enumerate(self._valueindex):
+                if rows is not None:
+                    for i, ikey in enumerate(ikeys, start):
+                        rows.setdefault(ikey[j], set()).add(i)
+        return
+
+    def _copy_values(self):
+        return
+
+    def _snapshot(self):
+        # solutions are replaced in place
+        return self.solutions.copy()
+
+class SQLiteParameterMap(ParameterMap):
+    """ ParameterMap that records each solution in a SQLite database at *path*
+    as it is set.
+
+    Writes are committed in transactions of *batchsize* runs, and on `flush`
+    or `close`. If *path* already holds a map with the same parameter names,
+    its runs are loaded, so that an interrupted ensemble can be resumed by
+    passing the map to `fillspace` or `latin_hypercube`. Solutions are
+    pickled.
+    """
+
+    def __init__(self, parameters, path, solntype=None, batchsize=100):
+        super(SQLiteParameterMap, self).__init__(parameters, solntype=solntype)
+        self.path = path
+        self.batchsize = batchsize
+        self._uncommitted = 0
+        self._conn = sqlite3.connect(path)
+        self._open()
+        return
+
+    def __repr__(self):
+        return "{0}({1})".format(super(SQLiteParameterMap, self).__repr__(),
+                                 self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _open(self):
+        cols = ", ".join("p{0}".format(j) for j in range(len(self.names)))
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta "
+                           "(key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS runs (row INTEGER "
+                           "PRIMARY KEY, {0}, soln BLOB)".format(cols))
+        row = self._conn.execute("SELECT value FROM meta WHERE key='names'"
+                                 ).fetchone()
+        if row is None:
+            self._conn.execute("INSERT INTO meta VALUES ('names', ?)",
+                               (json.dumps(self.names),))
+            self._conn.commit()
+        elif json.loads(row[0]) != self.names:
+            raise ValueError("{0} contains parameters {1}, not {2}".format(
+                             self.path, json.loads(row[0]), self.names))
+
+        # database row ids of the rows in memory
+        self._rowids = []
+        cursor = self._conn.execute("SELECT * FROM runs ORDER BY row")
+        for row in cursor:
+            key, soln = row[1:-1], pickle.loads(row[-1])
+            self._checktype(soln)
+            self._index[_indexkey(key)] = len(self)
+            super(SQLiteParameterMap, self)._append(key, soln)
+            self._rowids.append(row[0])
+        return
+
+    def _append(self, key, soln):
+        # pickle and insert first, so a solution that can't be stored leaves
+        # no row behind
+        values = tuple(_pyvalue(k) for k in key) + (pickle.dumps(soln),)
+        cursor = self._conn.execute("INSERT INTO runs VALUES (NULL, {0})"
+                                    .format(", ".join("?"*len(values))),
+                                    values)
+        super(SQLiteParameterMap, self)._append(key, soln)
+        self._rowids.append(cursor.lastrowid)
+        self._written()
+        return
+
+    def _replace(self, i, soln):
+        self._conn.execute("UPDATE runs SET soln=? WHERE row=?",
+                           (pickle.dumps(soln), self._rowids[i]))
+        super(SQLiteParameterMap, self)._replace(i, soln)
+        self._written()
+        return
+
+    def _written(self):
+        self._uncommitted += 1
+        if self._uncommitted >= self.batchsize:
+            self.flush()
+        return
+
+    def flush(self):
+        """ Commit pending writes to the database. """
+        self._conn.commit()
+        self._uncommitted = 0
+        return
+
+    def close(self):
+        """ Commit pending writes and close the database. """
+        self.flush()
+        self._conn.close()
+        return
+
+    def copy(self):
+        """ Return an in-memory ParameterMap copy. """
+        return _inmemory(self)
+
+class MemmapParameterMap(ParameterMap):
+    """ ParameterMap for large, fixed-shape array solutions, which are
+    appended to a raw binary file in *directory* rather than held in memory.
+
+    Parameter values are kept in a JSON-lines sidecar, and `solutions` is a
+    read-only `numpy.memmap` onto the solution file, so maps larger than
+    memory can be built and analysed. The solution *shape* and *dtype* are
+    taken from the first solution if not given. If *directory* already holds
+    a map with the same parameter names, it is reopened.
+    """
+
+    def __init__(self, parameters, directory, solntype=None, shape=None,
+                 dtype=None):
+        super(MemmapParameterMap, self).__init__(parameters, solntype=solntype)
+        self.directory = directory
+        self.shape = None if shape is None else tuple(shape)
+        self.dtype = dtype
+        self._memmap = None
+        self._solnfile = None
+        self._parfile = None
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._open()
+        return
+
+    def __repr__(self):
+        return "{0}({1})".format(super(MemmapParameterMap, self).__repr__(),
+                                 self.directory)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _init_storage(self, n):
+        self.values = [[] for _ in range(n)]
+        self._n = 0
+        return
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _open(self):
+        import numpy as np
+        metapath = self._path("meta.json")
+        if not os.path.exists(metapath):
+            if self.dtype is not None:
+                self.dtype = np.dtype(self.dtype)
+            return
+        with open(metapath) as f:
+            meta = json.load(f)
+        if meta["names"] != self.names:
+            raise ValueError("{0} contains parameters {1}, not {2}".format(
+                             self.directory, meta["names"], self.names))
+        self.shape = tuple(meta["shape"])
+        self.dtype = np.dtype(meta["dtype"])
+        self.solntype = np.ndarray
+
+        # a run is complete once both its solution and parameters are written
+        nsolns = os.path.getsize(self._path("solutions.dat")) // self._rowbytes()
+        with open(self._path("parameters.jsonl")) as f:
+            for line in itertools.islice(f, nsolns):
+                # a crash can leave the last line partly written
+                if not line.endswith("\n"):
+                    break
+                try:
+                    key = tuple(json.loads(line))
+                except ValueError:
+                    break
+                self._index[_indexkey(key)] = self._n
+                for j, k in enumerate(key):
+                    self.values[j].append(k)
+                self._n += 1
+        self._openfiles()
+        return
+
+    def _create(self, soln):
+        if self.shape is None:
+            self.shape = soln.shape
+        if self.dtype is None:
+            self.dtype = soln.dtype
+        self.solntype = type(soln)
+        open(self._path("solutions.dat"), "wb").close()
+        open(self._path("parameters.jsonl"), "w").close()
+        with open(self._path("meta.json"), "w") as f:
+            json.dump({"names": self.names, "shape": list(self.shape),
+                       "dtype": self.dtype.str}, f)
+        return
+
+    def _openfiles(self):
+        self._solnfile = open(self._path("solutions.dat"), "r+b")
+        self._solnfile.truncate(self._n*self._rowbytes())
+        self._parfile = open(self._path("parameters.jsonl"), "r+")
+        for _ in range(self._n):
+            self._parfile.readline()
+        self._parfile.truncate(self._parfile.tell())
+        # reading ahead leaves the stream position past the truncation
+        self._parfile.seek(0, os.SEEK_END)
+        return
+
+    def _rowbytes(self):
+        import numpy as np
+        return int(np.prod(self.shape, dtype=int)) * self.dtype.itemsize
+
+    @property
+    def solutions(self):
+        import numpy as np
+        if self._n == 0:
+            return np.empty((0,) + (self.shape or ()), dtype=self.dtype)
+        if self._memmap is None or len(self._memmap) != self._n:
+            self.flush()
+            self._memmap = np.memmap(self._path("solutions.dat"),
+                                     dtype=self.dtype, mode="r",
+                                     shape=(self._n,) + self.shape)
+        return self._memmap
+
+    def __len__(self):
+        return self._n
+
+    def _checktype(self, soln):
+        if soln is None:
+            raise TypeError("MemmapParameterMap cannot store None solutions")
+        return
+
+    def _encode(self, soln):
+        import numpy as np
+        soln = np.asarray(soln)
+        if self._solnfile is None:
+            if not os.path.exists(self._path("meta.json")):
+                self._create(soln)
+            self._openfiles()
+        if soln.shape != self.shape:
+            raise ValueError("Solutions must have shape {0} (got {1})".format(
+                             self.shape, soln.shape))
+        return np.ascontiguousarray(soln, dtype=self.dtype).tobytes()
+
+    def _append(self, key, soln):
+        data = self._encode(soln)
+        self._solnfile.seek(0, os.SEEK_END)
+        self._solnfile.write(data)
+        self._parfile.write(json.dumps([_pyvalue(k) for k in key]) + "\n")
+        for j, k in enumerate(key):
+            self.values[j].append(k)
+        self._n += 1
+        self._memmap = None
+        return
+
+    def _replace(self, i, soln):
+        data = self._encode(soln)
+        self._solnfile.seek(i*len(data))
+        self._solnfile.write(data)
+        self._memmap = None
+        return
+
+    def flush(self):
+        """ Write buffered solutions and parameters to disk. """
+        if self._solnfile is not None:
+            self._solnfile.flush()
+            self._parfile.flush()
+        return
+
+    def close(self):
+        """ Flush and close the underlying files. """
+        if self._solnfile is not None:
+            self._solnfile.close()
+            self._parfile.close()
+            self._solnfile = self._parfile = None
+        self._memmap = None
+        return
+
+    def _snapshot(self):
+        # rows of the memmap would show later replacements, so read them in
+        import numpy as np
+        return np.array(self.solutions)
+
+    def copy(self):
+        """ Return an in-memory ParameterMap copy. """
+        import numpy as np
+        return _inmemory(self, solutions=list(np.array(self.solutions)))
+
+def concat(maps, duplicates="error"):
+    """ Return a new in-memory ParameterMap holding the solutions of all of
+    *maps*, with parameters in the order of the first. See
+    `ParameterMap.merge`. """
+    maps = list(maps)
+    if len(maps) == 0:
+        raise ValueError("concat requires at least one ParameterMap")
+    newmap = ParameterMap([])
+    newmap.names = list(maps[0].names)
+    newmap.values = [[] for _ in newmap.names]
+    return newmap.merge(*maps, duplicates=duplicates)
+
+def _rowkeys(pmap):
+    """ Return the index keys of the rows of *pmap*, in row order. """
+    if pmap._index is None:
+        pmap._reindex()
+    ikeys = [None]*len(pmap)
+    for ikey, i in pmap._index.items():
+        ikeys[i] = ikey
+    return ikeys
+
+def _reconcile(pmap, maps):
+    """ Return the type that the solutions of *maps* must be converted to
+    before merging into *pmap*, or None if their types already agree. """
+    solntypes = set(m.solntype for m in maps if m.solntype is not None)
+    if pmap.solntype is not None:
+        solntypes.add(pmap.solntype)
+    if len(solntypes) < 2:
+        return None
+    if not all(issubclass(t, numbers.Number) for t in solntypes):
+        raise TypeError("Cannot merge solutions of types {0}".format(
+                        ", ".join(sorted(t.__name__ for t in solntypes))))
+    target = type(reduce(operator.add, [t() for t in solntypes]))
+    if pmap.solntype is not None and pmap.solntype is not target:
+        if len(pmap) != 0:
+            raise TypeError("Cannot merge {0} solutions into a map of {1} "
+                            "solutions".format(target.__name__,
+                                               pmap.solntype.__name__))
+    pmap.solntype = target
+    return target
+
+def _inmemory(pmap, solutions=None):
+    """ Return an independent in-memory ParameterMap with the contents of
+    *pmap*. """
+    newmap = ParameterMap([])
+    newmap.names = list(pmap.names)
+    newmap.values = [list(v) for v in pmap.values]
+    if solutions is None:
+        solutions = copy.deepcopy(list(pmap.solutions))
+    newmap.solutions = solutions
+    newmap.solntype = pmap.solntype
+    newmap.annotations = copy.deepcopy(pmap.annotations)
+    newmap.failures = copy.deepcopy(pmap.failures)
+    newmap._reindex()
+    return newmap
+
+def _coldtype(value):
+    """ Return the NumPy dtype used to store the parameter *value* (or a
+    sequence of values). """
+    import numpy as np
+    dtype = np.asarray(value).dtype
+    if dtype.kind not in "biufcU":
+        return np.dtype(object)
+    return dtype
+
+def _promote(dtype1, dtype2):
+    """ Return a dtype able to hold values of both *dtype1* and *dtype2*. """
+    import numpy as np
+    if dtype1 == dtype2:
+        return dtype1
+    numeric = "biufc"
+    if (dtype1.kind in numeric and dtype2.kind in numeric) or \
+            (dtype1.kind == dtype2.kind == "U"):
+        return np.result_type(dtype1, dtype2)
+    return np.dtype(object)
 
 # class TreeParameterMap(collections.abc.MutableMapping):
 #     """ Implements a tree-based map through a potentially sparse parameter space.
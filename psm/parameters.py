@@ -1,19 +1,24 @@
 from math import log, exp
 
 class Parameter(object):
+    """ Defines a named parameter that can be automatically varied over a
+    range within *bounds*.
+
+    Parameters are immutable, so they can be shared between threads and
+    pickled to worker processes. Partitions are computed once for each number
+    of divisions and returned as read-only NumPy arrays (tuples if NumPy is
+    not installed).
+
+    Keyword arguments:
+    `scale::string` is either "linear" or "log"
+    """
+
+    __slots__ = ("name", "bounds", "scale", "_partitions")
+
+    distribution = "uniform"
 
     def __init__(self, name, bounds, scale="linear"):
-        """ Defines a named parameter that can be automatically varied over a
-        range within *bounds*.
-
-        Keyword arguments:
-        `scale::string` is either "linear" or "log"
-        """
-        self.scale = scale
-        self.distribution = "uniform"
-        self.name = name
-        self.bounds = bounds
-        self.values = []
+        _init(self, name=name, bounds=tuple(bounds), scale=scale)
         return
 
     def __repr__(self):
@@ -21,53 +26,114 @@ class Parameter(object):
                                                   self.bounds[0],
                                                   self.bounds[1])
 
-    def partition(self, n):
-        if n < 2:
-            raise ValueError("Partitions must be greater than 1")
+    def __setattr__(self, name, value):
+        raise AttributeError("Parameters are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Parameters are immutable")
 
-        if self.scale == "linear":
-            dx = (self.bounds[1] - self.bounds[0]) / (n-1)
-            self.values = [self.bounds[0]+dx*i for i in range(n)]
-        elif self.scale == "log":
-            dx = (log(self.bounds[1]) - log(self.bounds[0])) / (n-1)
-            self.values = [exp(log(self.bounds[0])+dx*i) for i in range(n)]
-        return self.values
+    def __reduce__(self):
+        return (type(self), (self.name, self.bounds, self.scale))
 
-    def fixed_at_index(self, i):
-        return FixedParameter(self.name, self.values[i])
+    def partition(self, n):
+        """ Return *n* values evenly spaced between the bounds, in log space
+        if `scale="log"`. """
+        return self._cached(n)[0]
+
+    def divisions(self, n):
+        """ Return the values of `partition` as a tuple of Python scalars,
+        which is what `combinations` passes to models. """
+        return self._cached(n)[1]
+
+    def _cached(self, n):
+        cached = self._partitions.get(n)
+        if cached is None:
+            if n < 2:
+                raise ValueError("Partitions must be greater than 1")
+            values = self._spacing(n)
+            if hasattr(values, "flags"):
+                values.flags.writeable = False
+                cached = (values, tuple(values.tolist()))
+            else:
+                cached = (values, values)
+            cached = self._partitions.setdefault(n, cached)
+        return cached
+
+    def _spacing(self, n):
+        lo, hi = self.bounds
+        try:
+            import numpy as np
+        except ImportError:
+            if self.scale == "log":
+                dx = (log(hi) - log(lo)) / (n-1)
+                return tuple(exp(log(lo)+dx*i) for i in range(n))
+            dx = (hi - lo) / (n-1)
+            return tuple(lo+dx*i for i in range(n))
+        if self.scale == "log":
+            return np.geomspace(lo, hi, n)
+        return np.linspace(lo, hi, n)
+
+    def fixed_at_index(self, i, n):
+        """ Return a FixedParameter at value *i* of the partition into *n*
+        values. """
+        return FixedParameter(self.name, self.divisions(n)[i])
 
 class DiscreteValueParameter(Parameter):
+    """ Defines a named parameter that can be automatically varied over
+    discrete values.
+    """
+
+    __slots__ = ("possiblevalues",)
+
+    distribution = "discrete"
 
     def __init__(self, name, values):
-        """ Defines a named parameter that can be automatically varied over
-        discrete values.
-        """
-        self.distribution = "discrete"
-        self.name = name
-        self.possiblevalues = values
+        _init(self, name=name, possiblevalues=tuple(values))
         return
 
     def __repr__(self):
         return "<DiscreteValueParameter[{0}]{{1}}>".format(self.name,
                                                            len(self.possiblevalues))
 
-    def partition(self, n):
-        N = len(self.possiblevalues)
-        if n < 2:
-            raise ValueError("Partitions must be greater than 1")
-        elif n > N:
-            raise ValueError("Only {0} partitions possible".format(N))
-
-        self.values = [self.possiblevalues[i] for i in range(0, N, N//n)]
-        return self.values
+    def __reduce__(self):
+        return (type(self), (self.name, self.possiblevalues))
+
+    def _cached(self, n):
+        cached = self._partitions.get(n)
+        if cached is None:
+            N = len(self.possiblevalues)
+            if n < 2:
+                raise ValueError("Partitions must be greater than 1")
+            elif n > N:
+                raise ValueError("Only {0} partitions possible".format(N))
+            values = self.possiblevalues[::N//n]
+            cached = self._partitions.setdefault(n, (values, values))
+        return cached
 
 class FixedParameter(object):
 
+    __slots__ = ("name", "value")
+
     def __init__(self, name, value):
-        self.name = name
-        self.value = value
+        _init(self, name=name, value=value)
+        return
 
     def __repr__(self):
         return "<FixedParameter[{0}]({1})>".format(self.name, self.value)
 
+    def __setattr__(self, name, value):
+        raise AttributeError("Parameters are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Parameters are immutable")
+
+    def __reduce__(self):
+        return (type(self), (self.name, self.value))
 
+def _init(obj, **attrs):
+    """ Set the attributes of an immutable parameter *obj*. """
+    for name, value in attrs.items():
+        object.__setattr__(obj, name, value)
+    if isinstance(obj, Parameter):
+        object.__setattr__(obj, "_partitions", {})
+    return
@@ -7,14 +7,13 @@ def plot2d(pmap, fp=None, ax=None, **kw):
         assert len(pmap.names) - len(fp) == 2
     if ax is None:
         ax = plt.gca()
-    A = pmap.extract_array(fp)
-    cm = ax.pcolormesh(np.array(pmap.values[1]),
-                       np.array(pmap.values[0]),
-                       A, **kw)
-    ax.set_xticks(pmap.values[1])
-    ax.set_yticks(pmap.values[0])
-    ax.set_xlabel(pmap.names[1])
-    ax.set_ylabel(pmap.names[0])
+    A, (y, x) = pmap.extract_array(fp, masked=True, coords=True)
+    names = [n for n in pmap.names if n not in [p.name for p in (fp or [])]]
+    cm = ax.pcolormesh(x, y, A, **kw)
+    ax.set_xticks(x)
+    ax.set_yticks(y)
+    ax.set_xlabel(names[1])
+    ax.set_ylabel(names[0])
     ax.axis('tight')
     plt.colorbar(cm)
     return ax
@@ -0,0 +1,187 @@
+""" Reductions of ParameterMap solutions over parameter axes. Requires NumPy.
+"""
+
+from .core import RunFailure
+from .parametermap import ParameterMap, _indexkey
+
+REDUCTIONS = ("sum", "mean", "min", "max", "std", "median", "quantile")
+
+def groupreduce(pmap, over, func="mean", q=None):
+    """ Return a ParameterMap of the solutions in *pmap* reduced over the
+    parameters named in `over::list`, with one solution for each distinct
+    combination of the remaining parameters. See `ParameterMap.reduce`. """
+    import numpy as np
+    over = _overnames(pmap.names, over)
+    by = [j for j, name in enumerate(pmap.names) if name not in over]
+
+    groups, inverse = {}, []
+    keys = zip(*[pmap.values[j] for j in by]) if by else ((),)*len(pmap)
+    for key in keys:
+        inverse.append(groups.setdefault(_indexkey(key), len(groups)))
+    inverse = np.asarray(inverse, dtype=int)
+
+    solns = pmap.solutions
+    if not isinstance(solns, np.ndarray):
+        solns = list(solns)
+    solns = np.asarray(solns)
+    if callable(func):
+        result = [func(group) for group in _split(solns, inverse, len(groups))]
+    else:
+        result = _reduce(solns, inverse, len(groups), func, q)
+    return _newmap([pmap.names[j] for j in by], list(groups), result)
+
+def groupby(pmap, names):
+    """ Return a list of `(key, view)` pairs, where *view* is a read-only
+    ParameterMapView of the rows of *pmap* sharing the values *key* of the
+    parameters *names*. See `ParameterMap.groupby`. """
+    from .parametermap import ParameterMapView
+    if isinstance(names, str):
+        names = [names]
+    try:
+        cols = [pmap.names.index(name) for name in names]
+    except ValueError:
+        raise KeyError("Parameters {0} not all found".format(names))
+    groups = {}
+    for i, key in enumerate(zip(*[pmap.values[j] for j in cols])):
+        groups.setdefault(_indexkey(key), (key, []))[1].append(i)
+    rest = [j for j in range(len(pmap.names)) if j not in cols]
+    if isinstance(pmap, ParameterMapView):
+        return [(key, ParameterMapView(pmap.parent,
+                                       [pmap.rows[i] for i in rows],
+                                       [pmap.columns[j] for j in rest]))
+                for key, rows in groups.values()]
+    return [(key, ParameterMapView(pmap, rows, rest))
+            for key, rows in groups.values()]
+
+class StreamingReducer(object):
+    """ Sink that reduces results as they are produced, without storing
+    them, e.g. `fillspace(model, params, N, sink=StreamingReducer(["x"]))`.
+
+    Results are reduced over the parameters named in `over::list` with
+    `func::string`, one of "sum", "mean", "min", "max" or "std". Means and
+    standard deviations are updated with Welford's algorithm. Failed runs
+    passed as a `RunFailure` are skipped. Call `result` for a ParameterMap of
+    the reductions.
+    """
+
+    def __init__(self, over, func="mean"):
+        if func not in ("sum", "mean", "min", "max", "std"):
+            raise ValueError("StreamingReducer cannot compute '{0}'".format(func))
+        self.over = [over] if isinstance(over, str) else list(over)
+        self.func = func
+        self.names = None
+        self._groups = {}
+        return
+
+    def __repr__(self):
+        return "<StreamingReducer[{0}]({1} groups)>".format(self.func,
+                                                           len(self._groups))
+
+    def __call__(self, parameter_dict, result):
+        if isinstance(result, RunFailure):
+            return
+        if self.names is None:
+            self.names = [name for name in parameter_dict
+                          if name not in self.over]
+        key = _indexkey([parameter_dict[name] for name in self.names])
+        state = self._groups.get(key)
+        if state is None:
+            # count, running value, sum of squared deviations
+            self._groups[key] = [1, _float(result), 0.0]
+            return
+        state[0] += 1
+        if self.func == "sum":
+            state[1] = state[1] + result
+        elif self.func == "min":
+            state[1] = _min(state[1], result)
+        elif self.func == "max":
+            state[1] = _max(state[1], result)
+        else:
+            delta = result - state[1]
+            state[1] = state[1] + delta / state[0]
+            state[2] = state[2] + delta * (result - state[1])
+        return
+
+    def result(self):
+        """ Return a ParameterMap of the reduced solutions so far. """
+        import numpy as np
+        if self.func == "std":
+            solns = [np.sqrt(m2 / n) for n, _, m2 in self._groups.values()]
+        else:
+            solns = [value for _, value, _ in self._groups.values()]
+        return _newmap(self.names or [], list(self._groups), solns)
+
+def _overnames(names, over):
+    if isinstance(over, str):
+        over = [over]
+    for name in over:
+        if name not in names:
+            raise KeyError("Parameter '{0}' not found".format(name))
+    return list(over)
+
+def _reduce(solns, inverse, ngroups, func, q):
+    """ Reduce rows of *solns* that share a group number in *inverse*. """
+    import numpy as np
+    shape = (ngroups,) + solns.shape[1:]
+    if func in ("sum", "mean", "std"):
+        total = np.zeros(shape, dtype=np.result_type(solns.dtype, float))
+        np.add.at(total, inverse, solns)
+        if func == "sum":
+            return total
+        counts = np.bincount(inverse, minlength=ngroups)
+        counts = counts.reshape((ngroups,) + (1,)*(solns.ndim - 1))
+        mean = total / counts
+        if func == "mean":
+            return mean
+        sqdev = np.zeros(shape)
+        np.add.at(sqdev, inverse, (solns - mean[inverse])**2)
+        return np.sqrt(sqdev / counts)
+    elif func in ("min", "max"):
+        ufunc = np.minimum if func == "min" else np.maximum
+        out = np.empty(shape, dtype=solns.dtype)
+        first = np.unique(inverse, return_index=True)[1]
+        out[:] = solns[first]
+        ufunc.at(out, inverse, solns)
+        return out
+    elif func in ("median", "quantile"):
+        if func == "median":
+            q = 0.5
+        elif q is None:
+            raise ValueError("quantile reduction requires q")
+        return [np.quantile(group, q, axis=0)
+                for group in _split(solns, inverse, ngroups)]
+    raise ValueError("func must be a callable or one of {0} "
+                     "(got {1})".format(", ".join(REDUCTIONS), func))
+
+def _split(solns, inverse, ngroups):
+    """ Return a list of the rows of *solns* in each group. """
+    import numpy as np
+    order = np.argsort(inverse, kind="stable")
+    bounds = np.cumsum(np.bincount(inverse, minlength=ngroups))[:-1]
+    return np.split(solns[order], bounds)
+
+def _newmap(names, keys, solns):
+    import numpy as np
+    if isinstance(solns, np.ndarray) and solns.ndim == 1:
+        solns = solns.tolist()
+    else:
+        solns = [_float(s) for s in solns]
+    pmap = ParameterMap([])
+    pmap.names = list(names)
+    pmap.values = [[] for _ in names]
+    pmap.extend(keys, solns)
+    return pmap
+
+def _float(value):
+    """ Convert NumPy scalars to Python scalars, leaving arrays alone. """
+    if hasattr(value, "item") and getattr(value, "ndim", 1) == 0:
+        return value.item()
+    return value
+
+def _min(a, b):
+    import numpy as np
+    return np.minimum(a, b) if hasattr(a, "shape") else min(a, b)
+
+def _max(a, b):
+    import numpy as np
+    return np.maximum(a, b) if hasattr(a, "shape") else max(a, b)
@@ -0,0 +1,242 @@
+""" Space-filling designs generated with NumPy.
+
+The samplers return points in the unit hypercube as an `(n, d)` array, which
+`scale` maps onto Parameters, honouring `scale="log"` and the choices of a
+`DiscreteValueParameter`. `design` combines the two into a list of
+combinations, and `sample` runs a model over a design.
+"""
+
+from .core import _fill, _missing
+from .parametermap import ParameterMap
+
+# Primitive polynomials and initial direction numbers of the Sobol sequence
+# for dimensions 2 to 21, from S. Joe and F. Y. Kuo (2008), "Constructing
+# Sobol sequences with better two-dimensional projections", as
+# (degree, coefficients, initial direction numbers)
+SOBOL_DIRECTIONS = [
+    (1, 0, (1,)),
+    (2, 1, (1, 3)),
+    (3, 1, (1, 3, 1)),
+    (3, 2, (1, 1, 1)),
+    (4, 1, (1, 1, 3, 3)),
+    (4, 4, (1, 3, 5, 13)),
+    (5, 2, (1, 1, 5, 5, 17)),
+    (5, 4, (1, 1, 5, 5, 5)),
+    (5, 7, (1, 1, 7, 11, 19)),
+    (5, 11, (1, 1, 5, 1, 1)),
+    (5, 13, (1, 1, 1, 3, 11)),
+    (5, 14, (1, 3, 5, 5, 31)),
+    (6, 1, (1, 3, 3, 9, 7, 49)),
+    (6, 13, (1, 1, 1, 15, 21, 21)),
+    (6, 16, (1, 3, 1, 13, 27, 49)),
+    (6, 19, (1, 1, 1, 15, 7, 5)),
+    (6, 22, (1, 3, 1, 15, 13, 25)),
+    (6, 25, (1, 1, 5, 5, 19, 61)),
+    (7, 1, (1, 3, 7, 11, 23, 15, 103)),
+    (7, 4, (1, 3, 7, 13, 13, 15, 69)),
+]
+
+SOBOL_BITS = 32
+
+PRIMES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53, 59, 61,
+          67, 71, 73, 79, 83, 89, 97, 101, 103, 107, 109, 113)
+
+def lhs(n, d, seed=None, centered=False):
+    """ Return a random latin hypercube design of `n::int` points in `d::int`
+    dimensions. Each point lies at a random position within its cell, or at
+    the centre of the cell if `centered::bool`. """
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    cells = rng.permuted(np.tile(np.arange(n), (d, 1)), axis=1).T
+    offset = 0.5 if centered else rng.random((n, d))
+    return (cells + offset) / n
+
+def maximin_lhs(n, d, seed=None, candidates=10, iterations=1000):
+    """ Return a latin hypercube design of `n::int` points in `d::int`
+    dimensions, optimized to make the smallest distance between points as
+    large as possible.
+
+    The best of `candidates::int` random designs is improved for
+    `iterations::int` steps by exchanging coordinates between one of the two
+    closest points and another point, keeping exchanges that do not reduce
+    the smallest distance. The pairwise distance matrix takes O(n^2) memory,
+    so this is intended for designs of up to a few thousand points.
+    """
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    best, bestdist = None, -1.0
+    for _ in range(candidates):
+        points = lhs(n, d, seed=rng)
+        dist = _sqdistances(points)
+        if dist.min() > bestdist:
+            best, bestdist, D = points, dist.min(), dist
+    if n < 3:
+        return best
+
+    rowmin = D.min(axis=1)
+    for _ in range(iterations):
+        i = int(np.argmin(rowmin))
+        j = int(np.argmin(D[i]))
+        closest = D[i, j]
+        if rng.integers(2):
+            i, j = j, i
+        r = int(rng.integers(n - 1))
+        if r >= i:
+            r += 1
+        k = int(rng.integers(d))
+
+        best[[i, r], k] = best[[r, i], k]
+        new = _sqdistances(best[[i, r]], best)
+        new[0, i] = new[1, r] = np.inf
+        oldi, oldr = D[i].copy(), D[r].copy()
+        D[i], D[:, i] = new[0], new[0]
+        D[r], D[:, r] = new[1], new[1]
+        # rows keep their nearest distance unless it was to point i or r
+        stale = (oldi == rowmin) | (oldr == rowmin)
+        stale[[i, r]] = True
+        trialmin = np.minimum(rowmin, new.min(axis=0))
+        trialmin[stale] = D[stale].min(axis=1)
+
+        if trialmin.min() >= rowmin.min() and D[i, j] > closest:
+            rowmin = trialmin
+        else:
+            best[[i, r], k] = best[[r, i], k]
+            D[i], D[:, i] = oldi, oldi
+            D[r], D[:, r] = oldr, oldr
+    return best
+
+def sobol(n, d, skip=0, seed=None):
+    """ Return the first `n::int` points of the `d::int`-dimensional Sobol
+    sequence (up to 21 dimensions), after skipping `skip::int` points.
+
+    Balance properties are best when *n* is a power of two. If `seed::int`
+    is given, the sequence is randomized with a digital shift, which
+    preserves those properties.
+    """
+    import numpy as np
+    if d > len(SOBOL_DIRECTIONS) + 1:
+        raise ValueError("Sobol sequences are available for up to {0} "
+                         "dimensions".format(len(SOBOL_DIRECTIONS) + 1))
+    if n + skip > 2**SOBOL_BITS:
+        raise ValueError("Sobol sequences are limited to 2**{0} "
+                         "points".format(SOBOL_BITS))
+    directions = np.column_stack([_sobol_directions(j) for j in range(d)])
+    # points with indices below 2**(b+1) are those below 2**b combined with
+    # direction b, so the sequence is built by doubling, then put in Gray
+    # code order
+    nbits = max(int(skip + n - 1).bit_length(), 1)
+    table = np.zeros((2**nbits, d), dtype=np.uint64)
+    for b in range(nbits):
+        table[2**b:2**(b+1)] = table[:2**b] ^ directions[b]
+    index = np.arange(skip, skip + n)
+    points = table[index ^ (index >> 1)]
+    if seed is not None:
+        rng = np.random.default_rng(seed)
+        points ^= rng.integers(0, 2**SOBOL_BITS, size=d, dtype=np.uint64)
+    return points / float(2**SOBOL_BITS)
+
+def _sobol_directions(j):
+    """ Return the direction numbers of dimension *j* (counting from 0) as
+    `SOBOL_BITS`-bit integers. """
+    import numpy as np
+    if j == 0:
+        m = [1]*SOBOL_BITS
+    else:
+        s, a, m = SOBOL_DIRECTIONS[j-1]
+        m = list(m)
+        for k in range(s, SOBOL_BITS):
+            mk = m[k-s] ^ (m[k-s] << s)
+            for i in range(1, s):
+                if (a >> (s-1-i)) & 1:
+                    mk ^= m[k-i] << i
+            m.append(mk)
+    return np.array([mk << (SOBOL_BITS-1-k) for k, mk in enumerate(m)],
+                    dtype=np.uint64)
+
+def halton(n, d, skip=1, seed=None):
+    """ Return `n::int` points of the `d::int`-dimensional Halton sequence,
+    using the first *d* primes as bases and skipping the first `skip::int`
+    points (by default, the origin). If `seed::int` is given, the points are
+    shifted by a random offset modulo 1. """
+    import numpy as np
+    if d > len(PRIMES):
+        raise ValueError("Halton sequences are available for up to {0} "
+                         "dimensions".format(len(PRIMES)))
+    points = np.empty((n, d))
+    for j, base in enumerate(PRIMES[:d]):
+        index = np.arange(skip, skip + n)
+        x = np.zeros(n)
+        f = 1.0
+        while index.any():
+            f /= base
+            x += f * (index % base)
+            index //= base
+        points[:, j] = x
+    if seed is not None:
+        rng = np.random.default_rng(seed)
+        points = (points + rng.random(d)) % 1.0
+    return points
+
+SAMPLERS = {"lhs": lhs, "maximin": maximin_lhs, "sobol": sobol,
+            "halton": halton}
+
+def scale(parameters, points):
+    """ Map *points* in the unit hypercube onto *parameters*, returning a list
+    with an array of values for each parameter. Parameters with
+    `scale="log"` are sampled uniformly in log space, and
+    DiscreteValueParameters take one of their possible values. """
+    import numpy as np
+    points = np.asarray(points, dtype=float)
+    columns = []
+    for j, p in enumerate(parameters):
+        u = points[:, j]
+        choices = getattr(p, "possiblevalues", None)
+        if choices is not None:
+            index = np.minimum((u * len(choices)).astype(int), len(choices)-1)
+            choices = np.asarray(choices, dtype=object)
+            columns.append(choices[index])
+        elif getattr(p, "scale", "linear") == "log":
+            lo, hi = np.log(p.bounds[0]), np.log(p.bounds[1])
+            columns.append(np.exp(lo + u * (hi - lo)))
+        else:
+            lo, hi = p.bounds
+            columns.append(lo + u * (hi - lo))
+    return columns
+
+def design(parameters, n, method="lhs", seed=None, **kw):
+    """ Return a list of `n::int` combinations of *parameters* sampled with
+    `method::string`, one of "lhs", "maximin", "sobol" or "halton". Other
+    keyword arguments are passed to the sampler. """
+    try:
+        sampler = SAMPLERS[method]
+    except KeyError:
+        raise ValueError("method must be one of {0} (got {1})".format(
+                         ", ".join(sorted(SAMPLERS)), method))
+    points = sampler(n, len(parameters), seed=seed, **kw)
+    return list(zip(*[c.tolist() for c in scale(parameters, points)]))
+
+def sample(model_call, parameters, n, method="lhs", seed=None, executor=None,
+           workers=None, pmap=None, batchsize=None, monitor=None, **kw):
+    """ Run *model_call* over a design of `n::int` combinations from `design`
+    and return a ParameterMap. *executor*, *workers*, *pmap*, *batchsize*,
+    and *monitor* are as for `fillspace`. Resuming an interrupted run
+    requires the same *method* and `seed::int`. """
+    if pmap is None:
+        pmap = ParameterMap(parameters, **kw)
+    combos = design(parameters, n, method=method, seed=seed)
+    if monitor is not None:
+        monitor.start(len(combos))
+    return _fill(pmap, model_call, parameters, _missing(pmap, combos, monitor),
+                 executor, workers, batchsize, monitor)
+
+def _sqdistances(a, b=None):
+    """ Return squared distances between the rows of *a* and *b*, with the
+    distance of each row of *a* to itself set to infinity if *b* is None. """
+    import numpy as np
+    same = b is None
+    if same:
+        b = a
+    D = ((a[:, None, :] - b[None, :, :])**2).sum(axis=2)
+    if same:
+        np.fill_diagonal(D, np.inf)
+    return D
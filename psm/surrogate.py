@@ -0,0 +1,154 @@
+""" Interpolation of ParameterMap solutions at parameter values that were not
+run. Requires NumPy. """
+
+class Surrogate(object):
+    """ Interpolates the solutions in *pmap* at arbitrary parameter values.
+
+    Complete grids, such as those from `fillspace`, are interpolated
+    multilinearly between the surrounding grid points. Other maps, such as
+    those from `latin_hypercube`, are interpolated with linear radial basis
+    functions over parameters scaled to the unit interval. Solving for the
+    basis weights takes O(n^3) time for n solutions.
+
+    Solutions must be numeric, either scalars or arrays of a fixed shape.
+
+    Keyword arguments:
+    `parameters::list` are the Parameters of *pmap*. Parameters with
+    `scale="log"` are interpolated in log space
+    `method::string` is "grid" or "rbf". By default, "grid" is used if *pmap*
+    holds a complete grid and "rbf" otherwise
+    """
+
+    def __init__(self, pmap, parameters=None, method=None):
+        import numpy as np
+        if len(pmap) == 0:
+            raise ValueError("Cannot interpolate an empty ParameterMap")
+        self.names = list(pmap.names)
+        logaxes = set()
+        if parameters is not None:
+            logaxes = set(p.name for p in parameters
+                          if getattr(p, "scale", "linear") == "log")
+        self.log = np.array([name in logaxes for name in self.names])
+
+        coords = np.column_stack([np.asarray(v, dtype=float)
+                                  for v in pmap.values])
+        coords = self._transform(coords)
+        solns = np.asarray(list(pmap.solutions), dtype=float)
+        self.shape = solns.shape[1:]
+
+        axes = [np.unique(coords[:, j]) for j in range(coords.shape[1])]
+        complete = np.prod([len(a) for a in axes]) == len(solns)
+        if method is None:
+            method = "grid" if complete else "rbf"
+        if method == "grid":
+            if not complete:
+                raise ValueError("grid interpolation requires a complete grid")
+            cells = tuple(np.searchsorted(a, coords[:, j])
+                          for j, a in enumerate(axes))
+            grid = np.empty(tuple(len(a) for a in axes) + self.shape)
+            grid[cells] = solns
+            self.axes = axes
+            self.grid = grid
+        elif method == "rbf":
+            self.lower = coords.min(axis=0)
+            span = coords.max(axis=0) - self.lower
+            self.span = np.where(span == 0, 1.0, span)
+            self.centers = (coords - self.lower) / self.span
+            self.weights, self.poly = self._solve(solns.reshape(len(solns), -1))
+        else:
+            raise ValueError("method must be 'grid' or 'rbf' "
+                             "(got {0})".format(method))
+        self.method = method
+        self.bounds = np.array([coords.min(axis=0), coords.max(axis=0)])
+        return
+
+    def __repr__(self):
+        return "<Surrogate[{0}]({1})>".format(self.method,
+                                             ", ".join(self.names))
+
+    def _transform(self, coords):
+        import numpy as np
+        if self.log.any():
+            coords = coords.copy()
+            if (coords[:, self.log] <= 0).any():
+                raise ValueError("Parameters on a log scale must be positive")
+            coords[:, self.log] = np.log(coords[:, self.log])
+        return coords
+
+    def _solve(self, solns):
+        """ Return the weights of the radial basis functions and of the
+        linear polynomial term fitting *solns*. """
+        import numpy as np
+        n, d = self.centers.shape
+        P = np.hstack([np.ones((n, 1)), self.centers])
+        A = np.zeros((n+d+1, n+d+1))
+        A[:n, :n] = _distances(self.centers, self.centers)
+        A[:n, n:] = P
+        A[n:, :n] = P.T
+        b = np.zeros((n+d+1, solns.shape[1]))
+        b[:n] = solns
+        x = np.linalg.lstsq(A, b, rcond=None)[0]
+        return x[:n], x[n:]
+
+    def __call__(self, points):
+        """ Return the interpolated solutions at *points*, an array with one
+        row per point and one column per parameter, ordered as in `names`.
+        A single point returns a single solution. """
+        import numpy as np
+        points = np.asarray(points, dtype=float)
+        single = points.ndim == 1
+        points = self._transform(np.atleast_2d(points))
+        if points.shape[1] != len(self.names):
+            raise ValueError("Points must have {0} parameters".format(
+                             len(self.names)))
+        tol = 1e-9*np.maximum(1.0, np.abs(self.bounds).max(axis=0))
+        if ((points < self.bounds[0] - tol) |
+                (points > self.bounds[1] + tol)).any():
+            raise ValueError("Points lie outside the sampled parameter range")
+
+        if self.method == "grid":
+            result = self._multilinear(points)
+        else:
+            scaled = (points - self.lower) / self.span
+            P = np.hstack([np.ones((len(scaled), 1)), scaled])
+            result = (_distances(scaled, self.centers).dot(self.weights) +
+                      P.dot(self.poly))
+            result = result.reshape((len(points),) + self.shape)
+        return result[0] if single else result
+
+    def _multilinear(self, points):
+        import numpy as np
+        lower, frac = [], []
+        for j, axis in enumerate(self.axes):
+            if len(axis) == 1:
+                lower.append(np.zeros(len(points), dtype=int))
+                frac.append(np.zeros(len(points)))
+                continue
+            i = np.clip(np.searchsorted(axis, points[:, j], side="right") - 1,
+                        0, len(axis) - 2)
+            lower.append(i)
+            frac.append(np.clip((points[:, j] - axis[i]) /
+                                (axis[i+1] - axis[i]), 0.0, 1.0))
+
+        result = np.zeros((len(points),) + self.shape)
+        extra = (slice(None),) + (None,)*len(self.shape)
+        for corner in range(2**len(self.axes)):
+            weight = np.ones(len(points))
+            cell = []
+            for j, axis in enumerate(self.axes):
+                upper = (corner >> j) & 1
+                if upper and len(axis) == 1:
+                    weight = None
+                    break
+                weight = weight * (frac[j] if upper else 1 - frac[j])
+                cell.append(lower[j] + upper)
+            if weight is not None:
+                result += weight[extra] * self.grid[tuple(cell)]
+        return result
+
+def _distances(a, b):
+    """ Return the matrix of Euclidean distances between rows of *a* and
+    *b*. """
+    import numpy as np
+    diff = a[:, None, :] - b[None, :, :]
+    return np.sqrt((diff**2).sum(axis=2))
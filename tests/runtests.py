@@ -1,8 +1,32 @@
+import asyncio
 import unittest
 from psm import Parameter, FixedParameter, DiscreteValueParameter
 from psm import ParameterMap
 import psm
 from math import log
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import tracemalloc
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
 
 
 class PSMTests(unittest.TestCase):
@@ -43,6 +67,35 @@ class PSMTests(unittest.TestCase):
         self.assertEqual(len(v[2]), 4)
         pass
 
+    def test_parameters_immutable(self):
+        import pickle
+        knob = Parameter("tuning knob", [1, 100], scale="log")
+        toggle = DiscreteValueParameter("toggle", [3, 4, 5, 6])
+        with self.assertRaises(AttributeError):
+            knob.bounds = (0, 1)
+        self.assertIs(psm.getdivisions([knob], 3)[0], knob.divisions(3))
+        self.assertEqual(knob.divisions(3), (1.0, 10.0, 100.0))
+        self.assertIs(type(knob.divisions(3)[1]), float)
+        self.assertEqual(knob.fixed_at_index(1, 3).value, 10.0)
+        self.assertEqual(toggle.partition(2), (3, 5))
+        self.assertEqual(toggle.fixed_at_index(1, 2).value, 5)
+        if np is not None:
+            with self.assertRaises(ValueError):
+                knob.partition(3)[0] = 2.0
+        copy = pickle.loads(pickle.dumps(knob))
+        self.assertEqual((copy.name, copy.bounds, copy.scale),
+                         ("tuning knob", (1, 100), "log"))
+        self.assertEqual(pickle.loads(pickle.dumps(toggle)).possiblevalues,
+                         (3, 4, 5, 6))
+        fixed = FixedParameter("toggle", 3)
+        with self.assertRaises(AttributeError):
+            del fixed.value
+
+        class LogParameter(Parameter):
+            __slots__ = ()
+        self.assertIs(LogParameter("x", [1, 2]).__reduce__()[0], LogParameter)
+        return
+
     def test_combinations(self):
         knob = Parameter("tuning knob", [-5, 15])
         toggle = DiscreteValueParameter("toggle", [3, 4])
@@ -55,6 +108,233 @@ class PSMTests(unittest.TestCase):
         self.assertEqual(len(list(C2)), 25)
         return
 
+    def test_fillspace_threaded(self):
+        knob = Parameter("tuning knob", [-5, 15])
+        toggle = DiscreteValueParameter("toggle", [3, 4])
+        fudge = Parameter("fudge factor", [2.0, 10.0])
+        serial = psm.fillspace(self.model, [knob, toggle, fudge], [5, 2, 4])
+        pmap = psm.fillspace(self.model, [knob, toggle, fudge], [5, 2, 4],
+                             executor="thread", workers=4)
+        self.assertEqual(len(pmap), 40)
+        self.assertEqual(pmap.values, serial.values)
+        self.assertEqual(pmap.solutions, serial.solutions)
+        return
+
+    def test_iter_fillspace(self):
+        knob = Parameter("tuning knob", [-5, 15])
+        fudge = Parameter("fudge factor", [2.0, 10.0])
+        runs = psm.iter_fillspace(lambda p: p["tuning knob"], [knob, fudge], 3)
+        pars, res = next(runs)
+        self.assertEqual(pars, {"tuning knob": -5.0, "fudge factor": 2.0})
+        self.assertEqual(res, -5.0)
+        self.assertEqual(len(list(runs)), 8)
+        return
+
+    def test_iter_latin_hypercube_unordered(self):
+        knob = Parameter("tuning knob", [-5, 15])
+        fudge = Parameter("fudge factor", [2.0, 10.0])
+        runs = psm.iter_latin_hypercube(lambda p: p["tuning knob"],
+                                        [knob, fudge], 6, workers=3,
+                                        seed=0, ordered=False)
+        self.assertEqual(sorted(res for _, res in runs), [-5, -1, 3, 7, 11, 15])
+        return
+
+    def test_fillspace_sink(self):
+        knob = Parameter("tuning knob", [-5, 15])
+        total = []
+        sink = lambda pars, res: total.append(res)
+        ret = psm.fillspace(lambda p: p["tuning knob"], [knob], 5, sink=sink,
+                            workers=2)
+        self.assertTrue(ret is sink)
+        self.assertEqual(sum(total), 25.0)
+        return
+
+    def test_adaptive_refines_step(self):
+        x = Parameter("x", [0.0, 1.0])
+        pmap = psm.adaptive(lambda p: float(p["x"] > 0.3), [x], 3,
+                            metric=lambda s: s, budget=12)
+        self.assertTrue(len(pmap) <= 12)
+        near = [v for v in pmap.values[0] if 0.25 <= v <= 0.375]
+        self.assertEqual(len(near), len(pmap) - 3)
+        return
+
+    def test_adaptive_log_scale(self):
+        x = Parameter("x", [1.0, 100.0], scale="log")
+        color = DiscreteValueParameter("color", ["red", "blue"])
+        pmap = psm.adaptive(lambda p: p["x"], [x, color], 2,
+                            metric=lambda s: s, budget=6)
+        self.assertEqual(len(pmap), 6)
+        self.assertAlmostEqual(pmap[(10.0, "red")], 10.0)
+        self.assertAlmostEqual(pmap[(10.0, "blue")], 10.0)
+        return
+
+    def test_adaptive_keeps_grid_values(self):
+        a = Parameter("a", [0.0, 1.0])
+        b = Parameter("b", [0.1, 7.0], scale="log")
+        pmap = psm.adaptive(lambda p: float(p["a"] + p["b"] > 1.3), [a, b], 3,
+                            metric=lambda s: s, budget=40)
+        self.assertTrue(set(b.divisions(3)) <= set(pmap.values[1]))
+        self.assertEqual(len(set(pmap.values[1])),
+                         len(set(psm.parametermap._keyvalue(v)
+                                 for v in pmap.values[1])))
+        return
+
+    def test_adaptive_tolerance(self):
+        x = Parameter("x", [0.0, 1.0])
+        y = Parameter("y", [0.0, 1.0])
+        pmap = psm.adaptive(lambda p: 1.0, [x, y], 3,
+                            metric=lambda s: s, budget=100, tol=0.1)
+        self.assertEqual(len(pmap), 9)
+        with self.assertRaises(ValueError):
+            psm.adaptive(lambda p: 1.0, [x, y], 5, metric=lambda s: s,
+                         budget=10)
+        return
+
+    def test_successive_halving(self):
+        steps = []
+        def model(p):
+            for t in range(1, 9):
+                steps.append(p["x"])
+                yield p["x"]*t
+
+        x = Parameter("x", [1.0, 8.0])
+        pmap = psm.successive_halving(model, [x], 8, metric=lambda s: s,
+                                      keep=0.5, workers=2)
+        self.assertEqual(len(pmap), 8)
+        self.assertTrue(len(steps) < 8*8 // 2)
+        self.assertEqual(pmap.annotation((1.0,)),
+                         {"stage": 8, "finished": True})
+        self.assertEqual(pmap[(1.0,)], 8.0)
+        self.assertEqual(pmap.annotation((8.0,)),
+                         {"stage": 1, "finished": False})
+        self.assertEqual(pmap.annotation((3.0,)),
+                         {"stage": 2, "finished": False})
+
+        pmap = psm.successive_halving(model, [x], 8, metric=lambda s: s,
+                                      maximize=True, stages=2)
+        self.assertEqual(pmap.annotation((8.0,)),
+                         {"stage": 2, "finished": False})
+        self.assertEqual(pmap[(8.0,)], 16.0)
+        with self.assertRaises(ValueError):
+            psm.successive_halving(model, [x], 8, metric=lambda s: s, keep=0)
+        return
+
+    def test_monitor(self):
+        knob = Parameter("tuning knob", [-5, 15])
+        fudge = Parameter("fudge factor", [2.0, 10.0])
+        progress, before, after = [], [], []
+        monitor = psm.RunMonitor(
+                progress=lambda *args: progress.append(args),
+                before_run=lambda p: before.append(p),
+                after_run=lambda p, res, stats: after.append(stats),
+                memory=True)
+        pmap = psm.fillspace(lambda p: [0]*1000, [knob, fudge], 3,
+                             monitor=monitor, workers=2)
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertEqual(len(before), 9)
+        self.assertEqual(len(after), 9)
+        self.assertEqual([p[:2] for p in progress], [(i, 9) for i in range(1, 10)])
+        self.assertEqual(progress[-1][3], 0.0)
+        stats = pmap.annotation((5.0, 6.0))
+        self.assertTrue(stats["wall"] >= 0)
+        self.assertTrue(stats["cpu"] >= 0)
+        self.assertTrue(stats["peak_memory"] >= 8000)
+        fixed = pmap.fix_parameters(FixedParameter("fudge factor", 6.0))
+        self.assertEqual(fixed.annotation((5.0,)), stats)
+        return
+
+    @unittest.skipIf(np is None, "requires numpy")
+    def test_monitor_skipped_runs(self):
+        knob = Parameter("tuning knob", [-5, 15])
+        pmap = psm.fillspace(lambda p: 1, [knob], 3)
+        monitor = psm.RunMonitor()
+        psm.fillspace(lambda p: [1]*len(p["tuning knob"]), [knob], 5,
+                      pmap=pmap, monitor=monitor, batchsize=2)
+        self.assertEqual((monitor.done, monitor.skipped), (5, 3))
+        self.assertEqual(pmap.annotation((0.0,))["batchsize"], 2)
+        self.assertEqual(pmap.annotation((5.0,)), {})
+        return
+
+    def test_fillspace_unpicklable_process(self):
+        knob = Parameter("tuning knob", [-5, 15])
+        with self.assertRaises(TypeError):
+            psm.fillspace(lambda kw: kw["tuning knob"], [knob], 3,
+                          executor="process", workers=2)
+        return
+
+    def test_combination_space(self):
+        knob = Parameter("tuning knob", [-5, 15])
+        toggle = DiscreteValueParameter("toggle", [3, 4])
+        fudge = Parameter("fudge factor", [2.0, 10.0])
+        params = [knob, toggle, fudge]
+        space = psm.CombinationSpace(params, [5, 2, 3])
+        combos = list(psm.combinations(params, [5, 2, 3]))
+        self.assertEqual(len(space), 30)
+        self.assertEqual(list(space), combos)
+        self.assertEqual([space[k] for k in range(30)], combos)
+        self.assertEqual(space[-1], combos[-1])
+        self.assertEqual(space.index(combos[17]), 17)
+        self.assertEqual(list(space[5:20:4]), combos[5:20:4])
+        self.assertEqual(space[5:20:4].index(combos[13]), 2)
+        self.assertFalse(combos[14] in space[5:20:4])
+        return
+
+    def test_combination_space_shards(self):
+        params = [Parameter("a", [0, 1]), Parameter("b", [0, 1])]
+        space = psm.CombinationSpace(params, [4, 5])
+        for contiguous in (False, True):
+            shards = [space.shard(i, 3, contiguous=contiguous) for i in range(3)]
+            self.assertEqual(sorted(c for s in shards for c in s), sorted(space))
+            self.assertEqual([len(s) for s in shards], [7, 7, 6])
+        pmaps = [psm.fillspace(lambda p: p["a"], params, [4, 5], shard=(i, 3))
+                 for i in range(3)]
+        self.assertEqual(sum(len(pmap) for pmap in pmaps), 20)
+        return
+
+    def test_capture_failures(self):
+        knob = Parameter("tuning knob", [0, 4])
+        calls = []
+
+        def model(p):
+            calls.append(p["tuning knob"])
+            if p["tuning knob"] == 2.0:
+                raise ValueError("bad knob")
+            if p["tuning knob"] == 3.0:
+                time.sleep(1.0)
+            return p["tuning knob"]
+
+        with self.assertRaises(ValueError):
+            psm.fillspace(model, [knob], 5)
+        pmap = psm.fillspace(model, [knob], 5, retries=1, timeout=0.2,
+                             on_error="capture")
+        self.assertEqual(len(pmap), 3)
+        self.assertEqual(calls.count(2.0), 3)
+        failures = pmap.failures
+        self.assertEqual(sorted(failures), [(2.0,), (3.0,)])
+        self.assertEqual(failures[(2.0,)].error, "ValueError: bad knob")
+        self.assertEqual(failures[(2.0,)].attempts, 2)
+        self.assertTrue(failures[(3.0,)].error.startswith("TimeoutError"))
+        self.assertTrue(failures[(3.0,)].wall >= 0.4)
+        self.assertEqual(failures[(2.0,)].combo, (2.0,))
+
+        derived = pmap.apply(lambda soln: soln)
+        derived.fail((9.0,), failures[(2.0,)])
+        self.assertFalse((9.0,) in pmap.failures)
+
+        psm.rerun_failures(lambda p: -p["tuning knob"], [knob], pmap)
+        self.assertEqual(pmap.failures, {})
+        self.assertEqual(pmap[(3.0,)], -3.0)
+        self.assertEqual(len(pmap), 5)
+
+        x = Parameter("x", [0, 1])
+        pmap = psm.fillspace(lambda p: 1/(p["x"] - 1/6), [x], 7,
+                             on_error="capture")
+        self.assertEqual(len(pmap.failures), 1)
+        rerun = []
+        psm.rerun_failures(lambda p: rerun.append(p["x"]) or 0.0, [x], pmap)
+        self.assertEqual(rerun, [1/6])
+        self.assertTrue(1/6 in pmap.values[0])
+        return
 
     # def test_fillspace(self):
     #     knob = Parameter("tuning knob", [-5, 15])
@@ -90,6 +370,100 @@ class ParameterMapTests(unittest.TestCase):
         self.assertEqual(len(pmap), 27)
         return
 
+    def test_getitem(self):
+        pmap = self.pmap.copy()
+        for i, combo in enumerate(psm.combinations(self.parameters, 3)):
+            pmap.set(combo, i)
+        self.assertEqual(pmap[(0.0, 4.0, 8.0)], 5)
+        self.assertEqual(pmap[(1.0, 3.0, 7.0)], 10)
+        self.assertTrue((2.0, 5.0, 6.0) in pmap)
+        self.assertFalse((2.0, 5.0, 5.0) in pmap)
+        with self.assertRaises(KeyError):
+            pmap[(2.0, 5.0, 5.0)]
+        return
+
+    def test_getitem_float_tolerance(self):
+        pmap = ParameterMap([Parameter("x", [0, 1])])
+        pmap.set((0.1+0.2,), "a")
+        self.assertEqual(pmap[(0.3,)], "a")
+        return
+
+    def test_setitem_replaces(self):
+        pmap = self.pmap.copy()
+        pmap.set((0, 3, 6), 1.0)
+        pmap.set((0, 3, 6), 2.0)
+        self.assertEqual(len(pmap), 1)
+        self.assertEqual(pmap[(0, 3, 6)], 2.0)
+        return
+
+    def test_apply(self):
+        model = lambda p: [p["a"], p["b"]]
+        pmap = psm.fillspace(model, self.parameters[:2], 3)
+        newmap = pmap.apply(lambda soln, k: soln + [k], 0)
+        self.assertEqual(newmap[(1.0, 5.0)], [1.0, 5.0, 0])
+        self.assertEqual(pmap[(1.0, 5.0)], [1.0, 5.0])
+        self.assertTrue(newmap.values is pmap.values)
+        return
+
+    def test_apply_threaded(self):
+        pmap = psm.fillspace(lambda p: p["a"], self.parameters[:2], 4)
+        newmap = pmap.apply(lambda soln: soln**2, executor="thread", workers=3)
+        self.assertEqual(newmap.solutions, [s**2 for s in pmap.solutions])
+        return
+
+    def test_apply_lazy(self):
+        calls = []
+        def square(soln):
+            calls.append(soln)
+            return soln**2
+        pmap = psm.fillspace(lambda p: p["a"], self.parameters[:2], 4)
+        newmap = pmap.apply(square, lazy=True).apply(square, lazy=True)
+        self.assertEqual(len(calls), 0)
+        self.assertEqual(newmap[(2.0, 3.0)], 16.0)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(newmap[(2.0, 3.0)], 16.0)
+        self.assertEqual(len(calls), 2)
+        return
+
+    def test_apply_lazy_snapshot(self):
+        pmap = psm.fillspace(lambda p: p["a"], self.parameters[:2], 4)
+        newmap = pmap.apply(lambda soln: -soln, lazy=True)
+        self.assertIs(newmap.solntype, None)
+        pmap[(2.0, 3.0)] = 99.0
+        self.assertEqual(newmap[(2.0, 3.0)], -2.0)
+        return
+
+    def test_apply_copy_on_write(self):
+        pmap = psm.fillspace(lambda p: p["a"], self.parameters[:2], 2)
+        newmap = pmap.apply(lambda soln: -soln)
+        newmap.set((7.0, 7.0), 0.0)
+        self.assertEqual(len(newmap), 5)
+        self.assertEqual(len(pmap), 4)
+        self.assertEqual(len(pmap.values[0]), 4)
+        self.assertFalse((7.0, 7.0) in pmap)
+        pmap.set((8.0, 8.0), 0.0)
+        self.assertFalse((8.0, 8.0) in newmap)
+        return
+
+    def test_apply_view(self):
+        pmap = psm.fillspace(lambda p: p["a"]*p["b"], self.parameters[:2], 3)
+        view = pmap.fix_parameters(FixedParameter("a", 2.0))
+        self.assertEqual(view.apply(lambda soln: -soln)[(4.0,)], -8.0)
+        lazy = view.apply(lambda soln: -soln, lazy=True)
+        self.assertEqual(lazy[(5.0,)], -10.0)
+        return
+
+    def test_apply_annotations_copied(self):
+        pmap = psm.fillspace(lambda p: p["a"], self.parameters[:2], 2)
+        pmap.annotate((0.0, 3.0), wall=1.0)
+        newmap = pmap.apply(lambda soln: -soln)
+        self.assertEqual(newmap.annotation((0.0, 3.0)), {"wall": 1.0})
+        newmap.annotate((0.0, 3.0), wall=2.0)
+        newmap.annotate((2.0, 5.0), note="child")
+        self.assertEqual(pmap.annotation((0.0, 3.0)), {"wall": 1.0})
+        self.assertEqual(pmap.annotation((2.0, 5.0)), {})
+        return
+
     # def test_construction(self):
     #     pmap = self.pmap.copy()
     #     pmap.set_null((3, 3, 3))
@@ -115,23 +489,759 @@ class ParameterMapTests(unittest.TestCase):
         #self.assertEqual(fixed_pmap.tree["idx"], [1])
         return
 
-    # def test_fix_parameters2(self):
-    #     # fix a parameter that isn't at the top level
-    #     fp = FixedParameter("b", 5)
-    #     fixed_pmap = self.pmap.fix_parameters([fp])
-    #     self.assertEqual(len(fixed_pmap), 9)
-    #     self.assertEqual(len(fixed_pmap.tree[0].keys()), 2)
-    #     self.assertEqual(fixed_pmap.tree[0]["idx"], [5])
-    #     return
+    def test_fix_parameters2(self):
+        # fix a parameter that isn't at the top level
+        pmap = psm.fillspace(lambda p: p["a"]+p["b"]+p["c"], self.parameters, 3)
+        fixed_pmap = pmap.fix_parameters(FixedParameter("b", 5))
+        self.assertEqual(len(fixed_pmap), 9)
+        self.assertEqual(fixed_pmap.names, ["a", "c"])
+        self.assertEqual(list(fixed_pmap.values[0]), [0, 0, 0, 1, 1, 1, 2, 2, 2])
+        self.assertEqual(fixed_pmap[(1.0, 8.0)], 14.0)
+        return
 
-    # def test_fix_multiple_parameters(self):
-    #     # fix a list of parameters
-    #     fps = [FixedParameter("b", 5), FixedParameter("c", 7)]
-    #     fixed_pmap = self.pmap.fix_parameters(fps)
-    #     self.assertEqual(len(fixed_pmap), 3)
-    #     self.assertEqual(len(fixed_pmap.tree[0][2].keys()), 2)
-    #     self.assertEqual(fixed_pmap.tree["idx"], [0, 1, 2])
-    #     return
+    def test_fix_multiple_parameters(self):
+        pmap = psm.fillspace(lambda p: p["a"]+p["b"]+p["c"], self.parameters, 3)
+        fps = [FixedParameter("c", 7), FixedParameter("b", 5)]
+        fixed_pmap = pmap.fix_parameters(fps)
+        self.assertEqual(len(fixed_pmap), 3)
+        self.assertEqual(list(fixed_pmap.solutions), [12.0, 13.0, 14.0])
+        self.assertTrue(fixed_pmap.solutions.seq is pmap.solutions)
+        self.assertEqual(len(fixed_pmap.fix_parameters(FixedParameter("a", 2))), 1)
+        return
+
+    def test_fix_parameters_after_set(self):
+        pmap = psm.fillspace(lambda p: p["a"], self.parameters, 2)
+        self.assertEqual(len(pmap.fix_parameters(FixedParameter("a", 0))), 4)
+        pmap.set((0, 0, 0), 1.0)
+        self.assertEqual(len(pmap.fix_parameters(FixedParameter("a", 0))), 5)
+        return
+
+    def test_concat_shards(self):
+        model = lambda p: p["a"] + p["b"] + p["c"]
+        shards = [psm.fillspace(model, self.parameters, 3, shard=(i, 4))
+                  for i in range(4)]
+        shards[2] = shards[2].copy()
+        key = next(zip(*shards[2].values))
+        shards[2].annotate(key, note="checked")
+        pmap = psm.concat(shards)
+        self.assertEqual(len(pmap), 27)
+        self.assertEqual(pmap[(1.0, 4.0, 8.0)], 13.0)
+        self.assertEqual(pmap.annotation(key), {"note": "checked"})
+        with self.assertRaises(KeyError):
+            psm.concat([shards[0], shards[0]])
+        return
+
+    def test_merge_duplicates(self):
+        first = psm.fillspace(lambda p: 1, self.parameters, 2)
+        reordered = psm.fillspace(lambda p: p["a"] + 0.5, self.parameters[::-1], 2)
+        merged = psm.concat([first, reordered], duplicates="last")
+        self.assertEqual(len(merged), 8)
+        self.assertEqual(merged.solntype, float)
+        self.assertEqual(merged[(2.0, 3.0, 6.0)], 2.5)
+        kept = psm.concat([first, reordered], duplicates="first")
+        self.assertEqual(kept[(2.0, 3.0, 6.0)], 1.0)
+        with self.assertRaises(TypeError):
+            first.copy().merge(reordered, duplicates="last")
+        with self.assertRaises(KeyError):
+            first.merge(psm.fillspace(lambda p: 1, self.parameters[:2], 2))
+        view = first.fix_parameters(FixedParameter("a", 0.0))
+        with self.assertRaises(TypeError):
+            view.merge(psm.fillspace(lambda p: 1, self.parameters[1:], 2))
+
+        fresh = ParameterMap(self.parameters)
+        fresh.set((9.0, 9.0, 9.0), 1)
+        with self.assertRaises(KeyError):
+            first.merge(fresh, first.copy())
+        self.assertEqual(len(first), 8)
+        self.assertFalse((9.0, 9.0, 9.0) in first)
+        return
+
+    def test_merge_clears_failures(self):
+        pmap = psm.fillspace(lambda p: 1.0, self.parameters, 2)
+        pmap.fail((1.0, 4.0, 7.0), psm.RunFailure("error", "", 1, 0.0))
+        other = ParameterMap(self.parameters[::-1])
+        other.set((7.0, 4.0, 1.0), 2.0)
+        pmap.merge(other)
+        self.assertEqual(pmap.failures, {})
+        self.assertEqual(pmap[(1.0, 4.0, 7.0)], 2.0)
+        return
+
+@unittest.skipIf(np is None, "requires numpy")
+class ColumnarParameterMapTests(unittest.TestCase):
+
+    def setUp(self):
+        self.parameters = [Parameter("a", [0, 2]),
+                           Parameter("b", [3, 5]),
+                           DiscreteValueParameter("c", ["x", "yy"])]
+        return
+
+    def test_scalar_solutions(self):
+        pmap = psm.ColumnarParameterMap(self.parameters, solntype=float,
+                                        capacity=2)
+        for i, combo in enumerate(psm.combinations(self.parameters, 2)):
+            pmap.set(combo, i)
+        self.assertEqual(len(pmap), 8)
+        self.assertEqual(pmap.solutions.dtype, np.float64)
+        self.assertEqual(pmap[(2.0, 3.0, "yy")], 5.0)
+        self.assertEqual(list(pmap.values[2]), ["x", "yy"]*4)
+        self.assertTrue(np.shares_memory(pmap.solutions, pmap._solns))
+        return
+
+    def test_array_solutions(self):
+        model = lambda p: np.full(3, p["a"]*p["b"])
+        pmap = psm.fillspace(model, self.parameters[:2], 3,
+                             pmap=psm.ColumnarParameterMap(self.parameters[:2]))
+        self.assertEqual(pmap.solutions.shape, (9, 3))
+        self.assertTrue(np.all(pmap[(1.0, 4.0)] == 4.0))
+        return
+
+    def test_failed_set_not_indexed(self):
+        pmap = psm.ColumnarParameterMap(self.parameters[:1])
+        pmap.set((0.0,), 1.0)
+        with self.assertRaises(ValueError):
+            pmap.set((1.0,), "hello")
+        pmap.set((2.0,), 3.0)
+        self.assertFalse((1.0,) in pmap)
+        self.assertEqual(len(pmap), 2)
+        self.assertEqual(pmap[(2.0,)], 3.0)
+        return
+
+    def test_to_ndarray(self):
+        params = [Parameter("a", [0, 2]), Parameter("b", [3, 5])]
+        pmap = psm.ParameterMap(params)
+        for a, b in reversed(list(psm.combinations(params, [3, 2]))):
+            pmap.set((a, b), a*b)
+        arr, (a, b) = pmap.to_ndarray(coords=True)
+        self.assertEqual(arr.shape, (3, 2))
+        self.assertEqual(list(a), [0.0, 1.0, 2.0])
+        self.assertEqual(list(b), [3.0, 5.0])
+        self.assertTrue(np.all(arr == np.outer(a, b)))
+        row = pmap.extract_array([FixedParameter("b", 5)])
+        self.assertEqual(list(row), [0.0, 5.0, 10.0])
+        return
+
+    def test_to_ndarray_missing(self):
+        pmap = psm.ParameterMap([Parameter("a", [0, 2]), Parameter("b", [3, 5])])
+        pmap.set((0, 3), 1)
+        pmap.set((1, 4), 2)
+        arr = pmap.to_ndarray()
+        self.assertTrue(np.isnan(arr[0, 1]))
+        self.assertEqual(arr[1, 1], 2.0)
+        marr = pmap.to_ndarray(masked=True)
+        self.assertEqual(marr.count(), 2)
+        self.assertEqual(pmap.to_ndarray(fill=-1)[1, 0], -1)
+        return
+
+    def test_to_ndarray_rounding_noise(self):
+        pmap = psm.ParameterMap([Parameter("a", [0, 1]), Parameter("b", [3, 5])])
+        pmap.set((0.0, 3), 1.0)
+        pmap.set((0.0, 5), 2.0)
+        pmap.set((0.1+0.2, 3), 3.0)
+        pmap.set((0.3, 5), 4.0)
+        arr, (a, b) = pmap.to_ndarray(coords=True)
+        self.assertEqual(arr.shape, (2, 2))
+        self.assertEqual(list(a), [0.0, 0.3])
+        self.assertEqual(arr.tolist(), [[1.0, 2.0], [3.0, 4.0]])
+        return
+
+    def test_to_ndarray_array_solutions(self):
+        pmap = psm.fillspace(lambda p: np.array([p["a"], p["b"]]),
+                             self.parameters[:2], 3,
+                             pmap=psm.ColumnarParameterMap(self.parameters[:2]))
+        arr = pmap.to_ndarray()
+        self.assertEqual(arr.shape, (3, 3, 2))
+        self.assertEqual(list(arr[2, 1]), [2.0, 4.0])
+        return
+
+    def test_batch_fillspace(self):
+        batches = []
+        def model(p):
+            batches.append(len(p["a"]))
+            return p["a"] * p["b"]
+        pmap = psm.fillspace(model, self.parameters[:2], [5, 3], batchsize=4,
+                             pmap=psm.ColumnarParameterMap(self.parameters[:2]))
+        self.assertEqual(batches, [4, 4, 4, 3])
+        self.assertEqual(len(pmap), 15)
+        self.assertEqual(pmap[(1.5, 4.0)], 6.0)
+        self.assertEqual(pmap.solutions.dtype, np.float64)
+        return
+
+    def test_batch_latin_hypercube_threaded(self):
+        model = lambda p: list(p["a"] + p["b"])
+        pmap = psm.latin_hypercube(model, self.parameters[:2], 10, seed=3,
+                                   batchsize=3, workers=2)
+        serial = psm.latin_hypercube(lambda p: p["a"] + p["b"],
+                                     self.parameters[:2], 10, seed=3)
+        self.assertEqual(pmap.values, serial.values)
+        self.assertEqual(pmap.solutions, serial.solutions)
+        return
+
+    def test_extend_existing_keys(self):
+        pmap = psm.ColumnarParameterMap(self.parameters[:2])
+        pmap.extend([(0, 3), (1, 3)], [1.0, 2.0])
+        pmap.extend([(1, 3), (2, 3)], [5.0, 6.0])
+        self.assertEqual(list(pmap.solutions), [1.0, 5.0, 6.0])
+        return
+
+    def test_column_promotion(self):
+        pmap = psm.ColumnarParameterMap([Parameter("a", [0, 2])])
+        pmap.set((1,), 1.0)
+        pmap.set((1.5,), 2.0)
+        self.assertEqual(list(pmap.values[0]), [1.0, 1.5])
+        return
+
+@unittest.skipIf(np is None, "requires numpy")
+class SurrogateTests(unittest.TestCase):
+
+    def setUp(self):
+        self.parameters = [Parameter("a", [0, 2]), Parameter("b", [3, 5])]
+        return
+
+    def test_interpolate_grid(self):
+        params = [Parameter("a", [0, 2]), Parameter("b", [1, 100], scale="log")]
+        pmap = psm.fillspace(lambda p: p["a"]*log(p["b"]), params, [3, 3])
+        surrogate = psm.Surrogate(pmap, parameters=params)
+        self.assertEqual(surrogate.method, "grid")
+        points = np.array([[0.5, 2.0], [1.5, 50.0], [2.0, 100.0]])
+        expected = points[:, 0]*np.log(points[:, 1])
+        self.assertTrue(np.allclose(surrogate(points), expected))
+        self.assertAlmostEqual(pmap.interpolate((1.0, 10.0), params),
+                               log(10.0))
+        with self.assertRaises(ValueError):
+            surrogate([3.0, 10.0])
+        return
+
+    def test_interpolate_scattered(self):
+        params = self.parameters
+        pmap = psm.latin_hypercube(lambda p: [p["a"] + 2*p["b"], p["a"]],
+                                   params, 12, seed=1)
+        surrogate = psm.Surrogate(pmap)
+        self.assertEqual(surrogate.method, "rbf")
+        result = surrogate([[0.3, 3.5], [1.2, 4.1]])
+        self.assertEqual(result.shape, (2, 2))
+        self.assertTrue(np.allclose(result, [[7.3, 0.3], [9.4, 1.2]]))
+        self.assertTrue(np.allclose(surrogate(list(zip(*pmap.values))),
+                                    list(pmap.solutions)))
+        return
+
+@unittest.skipIf(np is None, "requires numpy")
+class ReductionTests(unittest.TestCase):
+
+    def setUp(self):
+        self.parameters = [Parameter("a", [0, 2]),
+                           Parameter("b", [3, 5]),
+                           DiscreteValueParameter("c", ["x", "yy"])]
+        return
+
+    def test_reduce(self):
+        model = lambda p: p["a"]*p["b"] + (p["c"] == "yy")
+        pmap = psm.fillspace(model, self.parameters, [3, 2, 2])
+        mean = pmap.reduce(over=["a", "c"])
+        self.assertEqual(mean.names, ["b"])
+        self.assertEqual(mean[(3.0,)], 3.5)
+        self.assertEqual(mean[(5.0,)], 5.5)
+        self.assertEqual(pmap.reduce("a", "max")[(5.0, "yy")], 11.0)
+        self.assertEqual(pmap.reduce(["a"], "min")[(3.0, "x")], 0.0)
+        self.assertAlmostEqual(pmap.reduce(["a"], "std")[(3.0, "x")],
+                               np.std([0.0, 3.0, 6.0]))
+        self.assertEqual(pmap.reduce(["a"], "quantile", q=0.5)[(3.0, "x")], 3.0)
+        self.assertEqual(pmap.reduce(["a"], len)[(3.0, "x")], 3)
+        self.assertEqual(pmap.reduce(["a", "b", "c"], "sum")[()], 54.0)
+
+        arrays = psm.fillspace(lambda p: np.array([p["a"], p["b"]]),
+                               self.parameters[:2], 3,
+                               pmap=psm.ColumnarParameterMap(self.parameters[:2]))
+        self.assertEqual(list(arrays.reduce(["b"])[(2.0,)]), [2.0, 4.0])
+        return
+
+    def test_groupby(self):
+        pmap = psm.fillspace(lambda p: p["a"], self.parameters, [3, 2, 2])
+        groups = pmap.groupby(["c"])
+        self.assertEqual([key for key, _ in groups], [("x",), ("yy",)])
+        view = groups[1][1]
+        self.assertEqual(view.names, ["a", "b"])
+        self.assertEqual(len(view), 6)
+        self.assertEqual(view[(2.0, 5.0)], 2.0)
+        inner = view.groupby("b")
+        self.assertEqual(list(inner[0][1].values[0]), [0.0, 1.0, 2.0])
+        return
+
+    def test_streaming_reducer(self):
+        model = lambda p: p["a"]*p["b"]
+        expected = psm.fillspace(model, self.parameters[:2], 3)
+        for func in ("sum", "mean", "min", "max", "std"):
+            reducer = psm.fillspace(model, self.parameters[:2], 3,
+                                    sink=psm.StreamingReducer(["b"], func))
+            result = reducer.result()
+            for a in (0.0, 1.0, 2.0):
+                self.assertAlmostEqual(result[(a,)],
+                                       expected.reduce(["b"], func)[(a,)])
+        return
+
+class SQLiteParameterMapTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "runs.db")
+        self.parameters = [Parameter("a", [0, 4]),
+                           DiscreteValueParameter("b", ["red", "blue"])]
+        return
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        return
+
+    def test_reopen(self):
+        with psm.SQLiteParameterMap(self.parameters, self.path,
+                                    batchsize=3) as pmap:
+            for i, combo in enumerate(psm.combinations(self.parameters, 2)):
+                pmap.set(combo, [i])
+        pmap = psm.SQLiteParameterMap(self.parameters, self.path)
+        self.assertEqual(len(pmap), 4)
+        self.assertEqual(pmap[(4.0, "red")], [2])
+        pmap.close()
+        return
+
+    def test_unpicklable_solution(self):
+        with psm.SQLiteParameterMap(self.parameters, self.path) as pmap:
+            pmap.set((0.0, "red"), [0])
+            with self.assertRaises(Exception):
+                pmap.set((1.0, "red"), [lambda: 0])
+            self.assertEqual(len(pmap), 1)
+            self.assertFalse((1.0, "red") in pmap)
+            pmap.set((1.0, "red"), [1])
+            pmap.set((2.0, "red"), [2])
+        # leave a gap in the database row ids
+        conn = sqlite3.connect(self.path)
+        conn.execute("DELETE FROM runs WHERE p0=0.0")
+        conn.commit()
+        conn.close()
+        pmap = psm.SQLiteParameterMap(self.parameters, self.path)
+        self.assertEqual(len(pmap), 2)
+        pmap.set((2.0, "red"), [3])
+        pmap.close()
+        pmap = psm.SQLiteParameterMap(self.parameters, self.path)
+        self.assertEqual(pmap[(1.0, "red")], [1])
+        self.assertEqual(pmap[(2.0, "red")], [3])
+        pmap.close()
+        return
+
+    def test_resume_fillspace(self):
+        calls = []
+        def model(p):
+            if len(calls) == 7:
+                raise RuntimeError("crashed")
+            calls.append(p)
+            return p["a"]
+
+        pmap = psm.SQLiteParameterMap(self.parameters, self.path, batchsize=2)
+        with self.assertRaises(RuntimeError):
+            psm.fillspace(model, self.parameters, [5, 2], pmap=pmap)
+        pmap.close()
+
+        del calls[:]
+        pmap = psm.SQLiteParameterMap(self.parameters, self.path)
+        self.assertEqual(len(pmap), 7)
+        psm.fillspace(model, self.parameters, [5, 2], pmap=pmap)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(len(pmap), 10)
+        pmap.close()
+        return
+
+    def test_resume_latin_hypercube(self):
+        pmap = psm.ParameterMap(self.parameters[:1])
+        psm.latin_hypercube(lambda p: p["a"], self.parameters[:1], 4,
+                            pmap=pmap, seed=1)
+        pmap2 = psm.latin_hypercube(lambda p: 1/0, self.parameters[:1], 4,
+                                    pmap=pmap, seed=1)
+        self.assertEqual(len(pmap2), 4)
+        return
+
+class ModelCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.parameters = [Parameter("a", [0, 4]), Parameter("b", [1, 2])]
+        self.calls = 0
+        return
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        return
+
+    def model(self, p):
+        self.calls += 1
+        return p["a"] * p["b"]
+
+    def test_canonical_hash(self):
+        h1 = psm.canonical_hash({"a": 0.1+0.2, "b": 1}, version="1")
+        h2 = psm.canonical_hash({"b": 1, "a": 0.3}, version="1")
+        self.assertEqual(h1, h2)
+        self.assertNotEqual(h1, psm.canonical_hash({"b": 1, "a": 0.3}, "2"))
+        return
+
+    def test_memory_tier(self):
+        cached = psm.ModelCache(self.model, version="1")
+        psm.fillspace(cached, self.parameters, 3)
+        pmap = psm.fillspace(cached, self.parameters, [5, 3])
+        self.assertEqual(len(pmap), 15)
+        self.assertEqual(self.calls, 15)
+        self.assertEqual(cached.hits, 9)
+        self.assertEqual(cached.misses, 15)
+        return
+
+    def test_pickle_drops_memory_tier(self):
+        import pickle
+        cached = psm.ModelCache(repr, version="1")
+        cached({"a": 1})
+        cached({"a": 1})
+        copy = pickle.loads(pickle.dumps(cached))
+        self.assertEqual((copy.hits, copy.disk_hits, copy.misses), (0, 0, 0))
+        self.assertEqual(len(copy._memory), 0)
+        self.assertEqual(copy({"a": 1}), "{'a': 1}")
+        self.assertEqual(copy.misses, 1)
+        return
+
+    def test_disk_tier(self):
+        cached = psm.ModelCache(self.model, maxsize=1, directory=self.tmpdir)
+        psm.fillspace(cached, self.parameters, 3)
+        cached = psm.ModelCache(self.model, maxsize=1, directory=self.tmpdir)
+        psm.fillspace(cached, self.parameters, 3)
+        self.assertEqual(self.calls, 9)
+        self.assertEqual(cached.disk_hits, 9)
+        return
+
+    def test_disk_eviction(self):
+        cached = psm.ModelCache(self.model, directory=self.tmpdir,
+                                maxbytes=200)
+        psm.fillspace(cached, self.parameters, 5)
+        size = sum(os.path.getsize(os.path.join(self.tmpdir, f))
+                   for f in os.listdir(self.tmpdir))
+        self.assertTrue(0 < size <= 200)
+        return
+
+class AsyncRunnerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.parameters = [Parameter("a", [0, 4]), Parameter("b", [1, 2])]
+        return
+
+    def test_afillspace(self):
+        state = {"running": 0, "peak": 0}
+        async def model(p):
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+            await asyncio.sleep(0.01 * (5 - p["a"]))
+            state["running"] -= 1
+            return p["a"] * p["b"]
+
+        pmap = asyncio.run(psm.afillspace(model, self.parameters, 5,
+                                          concurrency=8))
+        serial = psm.fillspace(lambda p: p["a"] * p["b"], self.parameters, 5)
+        self.assertEqual(pmap.values, serial.values)
+        self.assertEqual(pmap.solutions, serial.solutions)
+        self.assertEqual(state["peak"], 8)
+        return
+
+    def test_alatin_hypercube_sync_model(self):
+        pmap = asyncio.run(psm.alatin_hypercube(lambda p: p["a"],
+                                                self.parameters, 5, seed=2))
+        self.assertEqual(sorted(pmap.solutions), [0, 1, 2, 3, 4])
+        return
+
+@unittest.skipIf(np is None, "requires numpy")
+class MemmapParameterMapTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.parameters = [Parameter("a", [0, 4]),
+                           DiscreteValueParameter("b", ["red", "blue"])]
+        self.model = lambda p: np.full((2, 3), p["a"], dtype=np.float32)
+        return
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        return
+
+    def test_fill_and_reopen(self):
+        with psm.MemmapParameterMap(self.parameters, self.tmpdir) as pmap:
+            psm.fillspace(self.model, self.parameters, [3, 2], pmap=pmap)
+            self.assertEqual(pmap.solutions.shape, (6, 2, 3))
+            self.assertTrue(isinstance(pmap.solutions, np.memmap))
+
+        pmap = psm.MemmapParameterMap(self.parameters, self.tmpdir)
+        self.assertEqual(len(pmap), 6)
+        self.assertEqual(pmap.solutions.dtype, np.float32)
+        self.assertTrue(np.all(pmap[(2.0, "blue")] == 2.0))
+        pmap.set((2.0, "blue"), np.zeros((2, 3)))
+        pmap.set((9.0, "red"), np.ones((2, 3)))
+        self.assertTrue(np.all(pmap[(2.0, "blue")] == 0.0))
+        self.assertEqual(len(pmap), 7)
+        with self.assertRaises(ValueError):
+            pmap.set((10.0, "red"), np.ones(3))
+        pmap.close()
+        return
+
+    def test_incomplete_run_dropped(self):
+        with psm.MemmapParameterMap(self.parameters, self.tmpdir) as pmap:
+            psm.fillspace(self.model, self.parameters, [3, 2], pmap=pmap)
+        with open(os.path.join(self.tmpdir, "solutions.dat"), "ab") as f:
+            f.write(b"\0" * 10)
+        pmap = psm.MemmapParameterMap(self.parameters, self.tmpdir)
+        self.assertEqual(len(pmap), 6)
+        psm.fillspace(self.model, self.parameters, [5, 2], pmap=pmap)
+        self.assertEqual(len(pmap), 10)
+        self.assertTrue(np.all(pmap.copy()[(3.0, "red")] == 3.0))
+        pmap.close()
+        return
+
+    def test_torn_parameter_line_dropped(self):
+        with psm.MemmapParameterMap(self.parameters, self.tmpdir) as pmap:
+            psm.fillspace(self.model, self.parameters, [3, 2], pmap=pmap)
+        path = os.path.join(self.tmpdir, "parameters.jsonl")
+        with open(path, "r+") as f:
+            f.truncate(os.path.getsize(path) - 5)
+        pmap = psm.MemmapParameterMap(self.parameters, self.tmpdir)
+        self.assertEqual(len(pmap), 5)
+        psm.fillspace(self.model, self.parameters, [3, 2], pmap=pmap)
+        self.assertEqual(len(pmap), 6)
+        pmap.close()
+        pmap = psm.MemmapParameterMap(self.parameters, self.tmpdir)
+        self.assertEqual(len(pmap), 6)
+        self.assertTrue(np.all(pmap[(4.0, "blue")] == 4.0))
+        pmap.close()
+        return
+
+    def test_failed_set_not_indexed(self):
+        with psm.MemmapParameterMap(self.parameters, self.tmpdir) as pmap:
+            pmap.set((0.0, "red"), np.zeros((2, 3)))
+            with self.assertRaises(ValueError):
+                pmap.set((1.0, "red"), np.ones(3))
+            pmap.set((2.0, "red"), np.full((2, 3), 2.0))
+            self.assertFalse((1.0, "red") in pmap)
+            self.assertEqual(len(pmap), 2)
+            self.assertTrue(np.all(pmap[(2.0, "red")] == 2.0))
+        return
+
+class DistributedTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.parameters = [Parameter("a", [0, 4]), Parameter("b", [1, 2])]
+        self.model = lambda p: p["a"] * p["b"]
+        return
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        return
+
+    def run_workers(self, queue, n, **kw):
+        counts = []
+        threads = [threading.Thread(target=lambda: counts.append(
+                        psm.distributed.work(self.model, queue, poll=0.01, **kw)))
+                   for _ in range(n)]
+        for t in threads:
+            t.start()
+        return threads, counts
+
+    def check(self, pmap):
+        serial = psm.fillspace(self.model, self.parameters, 4)
+        self.assertEqual(pmap.values, serial.values)
+        self.assertEqual(pmap.solutions, serial.solutions)
+        return
+
+    def test_directory_queue(self):
+        queue = psm.distributed.DirectoryQueue(self.tmpdir)
+        threads, counts = self.run_workers(queue, 3)
+        pmap = psm.distributed.serve(self.parameters,
+                                     psm.combinations(self.parameters, 4),
+                                     queue, poll=0.01, window=5)
+        for t in threads:
+            t.join()
+        self.check(pmap)
+        self.assertEqual(sum(counts), 16)
+        return
+
+    def test_directory_queue_lost_lease(self):
+        queue = psm.distributed.DirectoryQueue(self.tmpdir)
+        queue.open()
+        queue.put(0, ["a", "b"], (0.0, 1.0))
+        self.assertEqual(queue.claim("ghost"), (0, ["a", "b"], (0.0, 1.0)))
+        self.assertEqual(queue.claim("worker"), None)
+        time.sleep(0.05)
+        queue.reclaim(0.01)
+        self.assertEqual(queue.claim("worker"), (0, ["a", "b"], (0.0, 1.0)))
+        return
+
+    def test_socket_queue_bad_requests(self):
+        from multiprocessing.connection import Client
+        queue = psm.distributed.SocketQueue(("localhost", 0))
+        queue.open()
+        timeout = psm.distributed.REQUEST_TIMEOUT
+        psm.distributed.REQUEST_TIMEOUT = 0.1
+        try:
+            stalled = Client(queue.address, authkey=queue.authkey)
+            for request in (5, ("complete", "w"), ("renew",)):
+                conn = Client(queue.address, authkey=queue.authkey)
+                conn.send(request)
+                self.assertEqual(conn.recv()[0], "error")
+                conn.close()
+            stalled.close()
+            self.assertTrue(queue._thread.is_alive())
+            queue.put(0, ["a"], (1.0,))
+            worker = psm.distributed.SocketQueue(queue.address, queue.authkey)
+            self.assertEqual(worker.claim("w"), (0, ["a"], (1.0,)))
+        finally:
+            psm.distributed.REQUEST_TIMEOUT = timeout
+            queue.close()
+        return
+
+    def test_socket_queue(self):
+        queue = psm.distributed.SocketQueue(("localhost", 0))
+        queue.open()
+        queue.close()
+        self.assertEqual(len(queue.authkey), 32)
+        address = queue.address
+        key = os.urandom(16)
+
+        done = threading.Event()
+        result = {}
+        def coordinate():
+            result["pmap"] = psm.distributed.serve(
+                    self.parameters, psm.combinations(self.parameters, 4),
+                    psm.distributed.SocketQueue(address, key), poll=0.01,
+                    lease=0.05)
+            done.set()
+        coordinator = threading.Thread(target=coordinate)
+        coordinator.start()
+
+        # a client with the wrong key is turned away
+        intruder = psm.distributed.SocketQueue(address, b"guess")
+        with self.assertRaises(multiprocessing.AuthenticationError):
+            intruder.claim("intruder")
+
+        # a worker that leases a task and disappears
+        ghost = psm.distributed.SocketQueue(address, key)
+        while ghost.claim("ghost") is None:
+            time.sleep(0.01)
+
+        worker = psm.distributed.SocketQueue(address, key)
+        threads, counts = self.run_workers(worker, 2)
+        coordinator.join()
+        for t in threads:
+            t.join()
+        self.check(result["pmap"])
+        self.assertEqual(sum(counts), 16)
+        return
+
+@unittest.skipIf(np is None, "requires numpy")
+class SamplingTests(unittest.TestCase):
+
+    def setUp(self):
+        self.parameters = [Parameter("a", [1, 100], scale="log"),
+                           DiscreteValueParameter("b", ["x", "y", "z"]),
+                           Parameter("c", [-1, 1])]
+        return
+
+    def test_lhs(self):
+        points = psm.sampling.lhs(20, 3, seed=4)
+        cells = np.sort((points*20).astype(int), axis=0)
+        self.assertTrue(np.all(cells == np.arange(20)[:, None]))
+        self.assertTrue(np.all(points == psm.sampling.lhs(20, 3, seed=4)))
+        return
+
+    def test_maximin_lhs(self):
+        mindist = lambda p: psm.sampling._sqdistances(p).min()
+        points = psm.sampling.maximin_lhs(30, 2, seed=1)
+        cells = np.sort((points*30).astype(int), axis=0)
+        self.assertTrue(np.all(cells == np.arange(30)[:, None]))
+        self.assertTrue(mindist(points) > mindist(psm.sampling.lhs(30, 2, seed=1)))
+        return
+
+    def test_sobol(self):
+        points = psm.sampling.sobol(8, 3)
+        self.assertEqual(points[:4].tolist(), [[0.0, 0.0, 0.0], [0.5, 0.5, 0.5],
+                                               [0.75, 0.25, 0.25],
+                                               [0.25, 0.75, 0.75]])
+        points = psm.sampling.sobol(1024, 21, seed=2)
+        for j in range(21):
+            self.assertEqual(len(np.unique((points[:, j]*1024).astype(int))), 1024)
+        self.assertTrue(np.all(psm.sampling.sobol(4, 2, skip=4) ==
+                               psm.sampling.sobol(8, 2)[4:]))
+        return
+
+    def test_halton(self):
+        points = psm.sampling.halton(4, 2)
+        self.assertTrue(np.allclose(points, [[0.5, 1/3], [0.25, 2/3],
+                                             [0.75, 1/9], [0.125, 4/9]]))
+        return
+
+    def test_design_scaling(self):
+        combos = psm.sampling.design(self.parameters, 64, "sobol")
+        self.assertEqual(len(combos), 64)
+        a, b, c = zip(*combos)
+        self.assertAlmostEqual(a[1], 10.0)
+        self.assertEqual(sorted(set(b)), ["x", "y", "z"])
+        self.assertTrue(min(c) >= -1 and max(c) < 1)
+        pmap = psm.sampling.sample(lambda p: p["c"], self.parameters, 16,
+                                   method="halton", seed=0)
+        self.assertEqual(len(pmap), 16)
+        return
+
+@unittest.skipIf(np is None, "requires numpy")
+class ColumnarExportTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.parameters = [Parameter("a", [0, 2]),
+                           DiscreteValueParameter("c", ["x", "yy"]),
+                           Parameter("b", [3, 5])]
+        self.pmap = psm.fillspace(lambda p: np.array([[p["a"], p["b"]], [1, 2]]),
+                                  self.parameters, [3, 2, 4])
+        return
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        return
+
+    def check_roundtrip(self, write, read):
+        path = os.path.join(self.tmpdir, "runs")
+        write(self.pmap, path, chunksize=5)
+        pmap = read(path)
+        self.assertEqual(len(pmap), 24)
+        self.assertEqual(pmap.names, ["a", "c", "b"])
+        self.assertEqual(pmap[(1.0, "yy", 5.0)].tolist(), [[1.0, 5.0], [1.0, 2.0]])
+
+        fixed = read(path, fixparams=[FixedParameter("c", "x"),
+                                      FixedParameter("b", 3 + 2/3)])
+        self.assertEqual(fixed.names, ["a"])
+        self.assertEqual(list(fixed.values[0]), [0.0, 1.0, 2.0])
+        self.assertEqual(fixed[(2.0,)][0, 1], self.pmap[(2.0, "x", 3 + 2/3)][0, 1])
+        with self.assertRaises(ValueError):
+            read(path, parameters=["a", "b"])
+        return
+
+    @unittest.skipIf(pyarrow is None, "requires pyarrow")
+    def test_parquet(self):
+        self.check_roundtrip(psm.ParameterMap.to_parquet, psm.read_parquet)
+        return
+
+    @unittest.skipIf(h5py is None, "requires h5py")
+    def test_hdf5(self):
+        self.check_roundtrip(psm.ParameterMap.to_hdf5, psm.read_hdf5)
+        return
+
+    @unittest.skipIf(pyarrow is None, "requires pyarrow")
+    def test_arrow_scalar_view(self):
+        pmap = psm.fillspace(lambda p: p["a"]*p["b"], self.parameters, [3, 2, 4])
+        view = pmap.fix_parameters(FixedParameter("c", "yy"))
+        table = view.to_arrow(chunksize=7)
+        self.assertEqual(table.num_rows, 12)
+        self.assertEqual(table.column_names, ["a", "b", "solution"])
+        copy = psm.from_arrow(table, parameters=["a", "b"])
+        self.assertEqual(copy[(2.0, 5.0)], 10.0)
+        self.assertEqual(len(psm.from_arrow(table, fixparams=FixedParameter("a", 1))), 4)
+        return
 
 
 if __name__ == "__main__":